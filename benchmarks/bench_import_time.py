@@ -0,0 +1,85 @@
+"""
+bench_import_time.py – Import-time budget check for the editing viewer.
+
+Importing ``minimall_dash_viewer`` must stay cheap: no data loading, no
+argument parsing and none of the heavy libraries (Dash, Plotly,
+scikit-image, SciPy, NiBabel), which are imported only when an app is
+built. Each measurement runs in a fresh interpreter; the median of
+``--repeat`` runs is compared against ``--budget-ms``. The script exits
+with status 1 if the budget is exceeded or a heavy module was imported.
+
+Usage
+-----
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --budget-ms 300 --repeat 9
+    python benchmarks/bench_import_time.py --json out.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE = "minimall_dash_viewer"
+HEAVY_MODULES = ("dash", "plotly", "skimage", "scipy", "nibabel")
+DEFAULT_BUDGET_MS = 250.0
+
+_PROBE = f"""
+import json, sys, time
+sys.path.insert(0, {REPO_ROOT!r})
+t0 = time.perf_counter()
+import {MODULE}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{
+    "seconds": elapsed,
+    "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+def _measure() -> dict:
+    out = subprocess.run([sys.executable, "-c", _PROBE],
+                         check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help=f"Maximum median import time (default {DEFAULT_BUDGET_MS:g} ms).")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Number of fresh interpreters to time (default 5).")
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    runs = [_measure() for _ in range(args.repeat)]
+    median_ms = statistics.median(r["seconds"] for r in runs) * 1e3
+    heavy = sorted({m for r in runs for m in r["heavy"]})
+    ok = median_ms <= args.budget_ms and not heavy
+
+    print(f"import {MODULE}: median {median_ms:.1f} ms over {args.repeat} runs "
+          f"(budget {args.budget_ms:g} ms)")
+    if heavy:
+        print(f"heavy modules imported: {', '.join(heavy)}")
+    print("OK" if ok else "FAIL")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "module": MODULE,
+                "median_ms": median_ms,
+                "budget_ms": args.budget_ms,
+                "runs_ms": [r["seconds"] * 1e3 for r in runs],
+                "heavy_modules": heavy,
+                "ok": ok,
+            }, f, indent=2)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+bench_load_memory.py – Peak-RSS comparison of the NIfTI segmentation loaders.
+
+Each loader runs in a fresh subprocess so that ``ru_maxrss`` reflects only
+that load. "legacy" is the previous ``get_fdata()``-based loader (a full
+float64 copy, then a uint8 cast); "chunked" is
+``volume_utils.read_label_mask``.
+
+Usage
+-----
+    python benchmarks/bench_load_memory.py                  # bundled data
+    python benchmarks/bench_load_memory.py a.nii.gz b.nii.gz
+    python benchmarks/bench_load_memory.py --json out.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOADERS = ("legacy", "chunked")
+
+
+def _maxrss_bytes() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _worker(loader: str, filepath: str) -> None:
+    """Load one file with one loader and print a JSON result line."""
+    sys.path.insert(0, REPO_ROOT)
+    import nibabel as nib
+    import numpy as np
+
+    from volume_utils import read_label_mask
+
+    baseline = _maxrss_bytes()
+    t0 = time.perf_counter()
+    if loader == "legacy":
+        mask = nib.load(filepath).get_fdata().astype(np.uint8)
+        mask[mask > 1] = 0
+    else:
+        mask = read_label_mask(filepath)
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({
+        "loader": loader,
+        "file": filepath,
+        "shape": list(mask.shape),
+        "seconds": elapsed,
+        "peak_rss_bytes": _maxrss_bytes(),
+        "peak_delta_bytes": _maxrss_bytes() - baseline,
+    }))
+
+
+def _run(loader: str, filepath: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", loader, filepath],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("files", nargs="*",
+                        help="NIfTI files (default: data/hepaticvessel_*.nii.gz)")
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    parser.add_argument("--worker", nargs=2, metavar=("LOADER", "FILE"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(*args.worker)
+        return
+
+    files = args.files or sorted(glob.glob(os.path.join(REPO_ROOT, "data", "hepaticvessel_*.nii.gz")))
+    results = []
+    print(f"{'file':40s} {'loader':8s} {'seconds':>8s} {'peak MiB':>9s} {'delta MiB':>10s}")
+    for filepath in files:
+        for loader in LOADERS:
+            r = _run(loader, filepath)
+            results.append(r)
+            print(f"{os.path.basename(filepath):40s} {loader:8s} {r['seconds']:8.3f} "
+                  f"{r['peak_rss_bytes'] / 2**20:9.1f} {r['peak_delta_bytes'] / 2**20:10.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
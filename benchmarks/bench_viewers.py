@@ -0,0 +1,329 @@
+"""
+bench_viewers.py – Load, figure and callback benchmarks for both viewers.
+
+Runs the hot paths of the editor and the multi-volume viewer directly, no
+browser needed, on synthetic vessel-like volumes of several sizes and on
+the bundled ``data/hepaticvessel_*.nii.gz`` files:
+
+* loading: ``multi_viewer._load_nifti_volume``, ``load_labels`` and
+  ``load_thinning``, cold (empty volume cache) and warm;
+* figures: ``generate_slice_figure``, with a cold and a warm slice image
+  cache;
+* callbacks: the editor's ``handle_click`` and ``MultiViewer._update_3d``,
+  dispatched through the Dash server's test client like a browser
+  request, so the timings include serialization.
+
+Every step reports its median wall time over ``--repeat`` runs and its
+peak traced memory (one extra run under ``tracemalloc``); figure and
+callback steps also report their serialized size in bytes. Results can be
+written as JSON so that two commits can be compared.
+
+Usage
+-----
+    python benchmarks/bench_viewers.py                         # all sizes + bundled data
+    python benchmarks/bench_viewers.py --sizes 64 128 --no-data
+    python benchmarks/bench_viewers.py --json results.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np  # noqa: E402
+
+#: Synthetic volume shapes by name
+SIZES = {
+    "64": (64, 64, 64),
+    "128": (128, 128, 128),
+    "256": (256, 256, 256),
+    "512x512x600": (512, 512, 600),
+}
+
+
+def _maxrss_bytes() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _git_revision() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT,
+                             check=True, capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+def _ball(radius: int) -> np.ndarray:
+    r = np.arange(-radius, radius + 1)
+    offsets = np.stack(np.meshgrid(r, r, r, indexing="ij"), axis=-1).reshape(-1, 3)
+    return offsets[(offsets ** 2).sum(axis=1) <= radius * radius]
+
+
+def synthetic_vessels(shape: tuple[int, int, int], seed: int = 0) -> np.ndarray:
+    """Binary uint8 volume of randomly wandering, tapering tubes.
+
+    Vessel count and thickness scale with the volume, so larger volumes
+    have proportionally more (and thicker) foreground.
+    """
+    rng = np.random.default_rng(seed)
+    shape_arr = np.array(shape)
+    mask = np.zeros(shape, dtype=np.uint8)
+    size = min(shape)
+    balls: dict[int, np.ndarray] = {}
+    for _ in range(max(4, size // 16)):
+        pos = rng.uniform(0.2, 0.8, 3) * shape_arr
+        direction = rng.normal(size=3)
+        direction /= np.linalg.norm(direction)
+        radius = rng.uniform(1.5, max(2.0, 3.0 * size / 64))
+        for _ in range(int(rng.uniform(0.5, 1.5) * size)):
+            direction += rng.normal(0, 0.15, 3)
+            direction /= np.linalg.norm(direction)
+            pos += direction
+            if (pos < 0).any() or (pos >= shape_arr).any():
+                break
+            r = int(np.ceil(radius))
+            if r not in balls:
+                balls[r] = _ball(r)
+            voxels = balls[r] + np.round(pos).astype(np.int64)
+            voxels = voxels[((voxels >= 0) & (voxels < shape_arr)).all(axis=1)]
+            mask[tuple(voxels.T)] = 1
+            radius = max(1.0, radius * 0.998)
+    return mask
+
+
+def write_nifti(mask: np.ndarray, filepath: str) -> str:
+    import nibabel as nib
+
+    nib.save(nib.Nifti1Image(mask, np.eye(4)), filepath)
+    return filepath
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def measure(fn, repeat: int, setup=None) -> dict:
+    """Median wall time of ``fn()`` over ``repeat`` runs, and its peak traced memory.
+
+    ``setup()`` runs before every call, outside the timing. The peak is
+    taken from one extra run under ``tracemalloc`` (NumPy reports its
+    buffers to it), so tracing does not slow the timed runs down.
+    """
+    runs = []
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - t0)
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": statistics.median(runs), "runs": runs,
+            "peak_traced_bytes": peak, "result": result}
+
+
+def figure_bytes(figure) -> int:
+    from plotly.io.json import to_json_plotly
+
+    return len(to_json_plotly(figure).encode())
+
+
+def _callback(app, name: str):
+    """(callback id, spec) of the Dash callback whose function is ``name``."""
+    for key, spec in app.callback_map.items():
+        fn = getattr(spec.get("callback"), "__wrapped__", None)
+        if fn is not None and fn.__name__ == name:
+            return key, spec
+    raise KeyError(f"no callback named {name!r}")
+
+
+def _outputs(key: str):
+    if not key.startswith(".."):
+        component_id, prop = key.rsplit(".", 1)
+        return {"id": component_id, "property": prop}
+    return [dict(zip(("id", "property"), out.rsplit(".", 1)))
+            for out in key[2:-2].split("...")]
+
+
+def dispatch(client, app, name: str, values: dict, trigger: str):
+    """Call a Dash callback through the server like the browser does.
+
+    ``values`` maps ``"component.property"`` to the value of an input or
+    state (missing ones are None) and ``trigger`` is the input that
+    changed. Returns the raw response body.
+    """
+    key, spec = _callback(app, name)
+
+    def props(deps):
+        return [{**dep, "value": values.get(f"{dep['id']}.{dep['property']}")}
+                for dep in deps]
+
+    body = {"output": key, "outputs": _outputs(key),
+            "inputs": props(spec["inputs"]), "state": props(spec["state"]),
+            "changedPropIds": [trigger]}
+    response = client.post("/_dash-update-component", json=body)
+    if response.status_code not in (200, 204):
+        raise RuntimeError(f"{name} returned HTTP {response.status_code}: "
+                           f"{response.get_data(as_text=True)[:200]}")
+    return response.get_data()
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks of one labels file
+# ---------------------------------------------------------------------------
+
+def bench_file(labels_path: str, workdir: str, repeat: int, processes: int | None) -> dict:
+    import minimall_dash_viewer as editor_mod
+    import multi_viewer
+    from volume_cache import VolumeCache, set_default_cache
+
+    cache = VolumeCache(os.path.join(workdir, "cache"))
+    set_default_cache(cache)
+    steps = {}
+
+    def record(step, m, **extra):
+        m.pop("result")
+        steps[step] = {**m, **extra}
+        print(f"  {step:32s} {m['seconds'] * 1e3:10.1f} ms  "
+              f"peak {m['peak_traced_bytes'] / 2**20:8.1f} MiB"
+              + "".join(f"  {k} {v}" for k, v in extra.items()))
+
+    # -- loading --------------------------------------------------------------
+    record("_load_nifti_volume (cold)",
+           measure(lambda: multi_viewer._load_nifti_volume(labels_path), repeat, cache.clear))
+    record("_load_nifti_volume (warm)",
+           measure(lambda: multi_viewer._load_nifti_volume(labels_path), repeat))
+    record("load_labels (cold)",
+           measure(lambda: editor_mod.load_labels(labels_path), repeat, cache.clear))
+    m = measure(lambda: editor_mod.load_labels(labels_path), repeat)
+    labels = m["result"]
+    record("load_labels (warm)", m)
+    record("load_thinning (cold)",
+           measure(lambda: editor_mod.load_thinning(labels, labels_path, processes),
+                   repeat, cache.clear))
+    m = measure(lambda: editor_mod.load_thinning(labels, labels_path, processes), repeat)
+    skeleton = np.asarray(m["result"])
+    record("load_thinning (warm)", m, points=len(skeleton))
+
+    # -- editor ---------------------------------------------------------------
+    skeleton_path = os.path.join(workdir, "skeleton.npy")
+    editor_mod.save_skeleton(skeleton, skeleton_path)
+    editor = editor_mod.SkeletonEditor(labels_path, skeleton_path, processes=processes)
+    editor.load()
+    z = int(np.argmax(np.diff(editor.labels_index.offsets)))  # densest slice
+    skeleton_slices = editor_mod.SliceIndex.from_points(skeleton, labels.shape)
+
+    def fresh_images():
+        editor.slice_images = editor_mod.SliceImageCache(editor.labels_index.slice,
+                                                         labels.shape)
+
+    def slice_figure():
+        return editor_mod.generate_slice_figure(z, editor.slice_images, skeleton_slices)
+
+    m = measure(slice_figure, repeat, fresh_images)
+    record("generate_slice_figure (cold)", m, bytes=figure_bytes(m["result"]))
+    m = measure(slice_figure, repeat)
+    record("generate_slice_figure (warm)", m, bytes=figure_bytes(m["result"]))
+
+    app = editor.app
+    client = app.server.test_client()
+    xs, ys = editor.labels_index.slice(z)
+    click = {"points": [{"x": int(xs[0]), "y": int(ys[0])}]} if len(xs) else None
+    values = {"2d-slice-plot.clickData": click, "z-slider.value": z,
+              "edit-tool.value": "point", "edit-mode.value": editor_mod.EDIT_ADD,
+              "brush-radius.value": 3, "edit-depth.value": 0,
+              "snap-to-labels.value": ["snap"], "session-id.data": "bench"}
+    m = measure(lambda: dispatch(client, app, "handle_click", values,
+                                 "2d-slice-plot.clickData"), repeat)
+    record("handle_click", m, bytes=len(m["result"]))
+
+    # -- multi-volume viewer --------------------------------------------------
+    viewer = multi_viewer.MultiViewer()
+    volume_id = viewer.add_volume(labels_path)
+    skeleton_id = viewer.add_skeleton(skeleton_path)
+    mv_app = viewer._build_app()
+    mv_client = mv_app.server.test_client()
+    values = {"layer-store.data": viewer._store_data(),
+              "layer-checklist.value": [volume_id, skeleton_id],
+              "input-scale-mode.value": "data"}
+    m = measure(lambda: dispatch(mv_client, mv_app, "_update_3d", values,
+                                 "layer-store.data"), repeat)
+    record("_update_3d (rebuild)", m, bytes=len(m["result"]))
+    values["layer-checklist.value"] = [volume_id]
+    m = measure(lambda: dispatch(mv_client, mv_app, "_update_3d", values,
+                                 "layer-checklist.value"), repeat)
+    record("_update_3d (visibility)", m, bytes=len(m["result"]))
+
+    set_default_cache(None)
+    return {"file": labels_path, "shape": list(labels.shape),
+            "foreground_voxels": int(np.count_nonzero(labels)),
+            "skeleton_points": len(skeleton), "steps": steps}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", nargs="*", choices=list(SIZES), default=list(SIZES),
+                        help="Synthetic volume sizes to run (default: all).")
+    parser.add_argument("--no-data", action="store_true",
+                        help="Skip the bundled data/hepaticvessel_*.nii.gz files.")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Timed runs per step (default 3).")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="Worker processes for load_thinning (default: one per CPU).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench-viewers-") as tmp:
+        cases = []
+        for name in args.sizes:
+            path = os.path.join(tmp, f"synthetic_{name}.nii.gz")
+            write_nifti(synthetic_vessels(SIZES[name], args.seed), path)
+            cases.append((f"synthetic {name}", path))
+        if not args.no_data:
+            cases += [(os.path.basename(p), p) for p in
+                      sorted(glob.glob(os.path.join(REPO_ROOT, "data", "hepaticvessel_*.nii.gz")))]
+
+        for i, (name, path) in enumerate(cases):
+            print(name)
+            workdir = os.path.join(tmp, f"case{i}")
+            os.makedirs(workdir)
+            results.append({"case": name,
+                            **bench_file(path, workdir, args.repeat, args.processes)})
+
+    print(f"peak RSS {_maxrss_bytes() / 2**20:.1f} MiB")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"revision": _git_revision(), "repeat": args.repeat,
+                       "peak_rss_bytes": _maxrss_bytes(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+callback_timing.py – Opt-in timing of the Dash callbacks of both viewers.
+
+:class:`CallbackTimings` records every server callback request of an app:
+
+* ``total`` – wall time of the whole ``/_dash-update-component`` request;
+* ``prep`` – time spent in the callback function itself (loading and
+  preparing data, building figures or patches);
+* ``serialize`` – the rest of the request, which is mostly Dash encoding
+  the returned figures to JSON;
+* ``bytes`` – size of the response payload.
+
+Records go into a fixed-size ring buffer per callback, so recording is a
+few array writes and memory stays bounded however long the server runs.
+The summary (count and mean / p50 / p95 / max of every column) is served
+as JSON at ``/_timings`` to local clients only, and can also be shown in
+the page in a small panel that refreshes itself.
+
+Timing must be switched on before the callbacks are registered::
+
+    timings = CallbackTimings()
+    app = Dash(__name__)
+    timings.instrument(app)      # every app.callback after this is timed
+    ...
+    layout_children.append(timings.panel(app))   # optional in-page panel
+
+Only Flask (which Dash depends on) is needed; it is imported when an app
+is instrumented.
+"""
+
+from __future__ import annotations
+
+import functools
+import threading
+import time
+
+import numpy as np
+
+#: Columns of a timing record
+COLUMNS = ("total", "prep", "serialize", "bytes")
+
+#: Records kept per callback
+DEFAULT_CAPACITY = 1024
+
+#: Path of the JSON endpoint
+ENDPOINT = "/_timings"
+
+_LOCAL_ADDRS = ("127.0.0.1", "::1", "localhost")
+
+
+class RingBuffer:
+    """Fixed-size buffer of the last ``capacity`` rows of :data:`COLUMNS`."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self._rows = np.zeros((capacity, len(COLUMNS)), dtype=np.float64)
+        self._next = 0
+        self.count = 0  # rows ever appended
+
+    def append(self, row) -> None:
+        self._rows[self._next] = row
+        self._next = (self._next + 1) % len(self._rows)
+        self.count += 1
+
+    def rows(self) -> np.ndarray:
+        """The buffered rows, oldest first."""
+        if self.count < len(self._rows):
+            return self._rows[:self.count].copy()
+        return np.roll(self._rows, -self._next, axis=0)
+
+
+class CallbackTimings:
+    """Per-callback ring buffers of request timings (see module docstring)."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._buffers: dict[str, RingBuffer] = {}
+        self._lock = threading.Lock()
+        self._register = None  # the app's own callback decorator
+
+    # -- recording ------------------------------------------------------------
+
+    def record(self, name: str, total: float, prep: float, nbytes: int) -> None:
+        with self._lock:
+            buffer = self._buffers.get(name)
+            if buffer is None:
+                buffer = self._buffers[name] = RingBuffer(self.capacity)
+            buffer.append((total, prep, max(total - prep, 0.0), nbytes))
+
+    def _timed(self, func):
+        """Wrap a callback function so that its run time is noted for the request."""
+        from flask import g, has_request_context
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if has_request_context():
+                    g.timing_callback = func.__name__
+                    g.timing_prep = time.perf_counter() - t0
+
+        return timed
+
+    def instrument(self, app) -> None:
+        """Time every callback registered on ``app`` from now on.
+
+        Also adds the request hooks that measure the whole request and
+        the ``/_timings`` endpoint.
+        """
+        from flask import abort, g, jsonify, request
+
+        register = self._register = app.callback
+
+        def callback(*args, **kwargs):
+            decorator = register(*args, **kwargs)
+            return lambda func: decorator(self._timed(func))
+
+        app.callback = callback
+        server = app.server
+
+        @server.before_request
+        def _start_timing():
+            g.timing_start = time.perf_counter()
+
+        @server.after_request
+        def _stop_timing(response):
+            name = g.pop("timing_callback", None)
+            if name is not None:
+                total = time.perf_counter() - g.timing_start
+                nbytes = response.calculate_content_length()
+                if nbytes is None:
+                    nbytes = len(response.get_data())
+                self.record(name, total, g.pop("timing_prep"), nbytes)
+            return response
+
+        @server.route(ENDPOINT)
+        def _timings_endpoint():
+            if request.remote_addr not in _LOCAL_ADDRS:
+                abort(403)
+            return jsonify(self.summary(raw=request.args.get("raw") == "1"))
+
+    # -- reporting ------------------------------------------------------------
+
+    def summary(self, raw: bool = False) -> dict:
+        """Count and mean / p50 / p95 / max of every column, per callback.
+
+        Times are in milliseconds, sizes in bytes. With ``raw`` the
+        buffered records themselves are included too.
+        """
+        with self._lock:
+            buffers = {name: (b.count, b.rows()) for name, b in self._buffers.items()}
+        out = {}
+        for name, (count, rows) in sorted(buffers.items()):
+            rows = rows.copy()
+            rows[:, :3] *= 1e3  # seconds -> ms
+            stats = {"count": count}
+            for i, column in enumerate(COLUMNS):
+                values = rows[:, i]
+                stats[column] = {"mean": float(values.mean()),
+                                 "p50": float(np.percentile(values, 50)),
+                                 "p95": float(np.percentile(values, 95)),
+                                 "max": float(values.max())}
+            if raw:
+                stats["records"] = [dict(zip(COLUMNS, r)) for r in rows.tolist()]
+            out[name] = stats
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buffers.clear()
+
+    def panel(self, app, interval_ms: int = 2000):
+        """In-page table of the summary, refreshed every ``interval_ms``.
+
+        Returns the component to add to the layout of an instrumented
+        ``app``. Its own refresh callback is not timed.
+        """
+        from dash import Input, Output, dcc, html
+
+        register = self._register or app.callback
+
+        @register(Output("timings-table", "children"),
+                  Input("timings-poll", "n_intervals"))
+        def _refresh_timings(n_intervals):
+            header = html.Tr([html.Th(h) for h in
+                              ("callback", "n", "total p50 / p95 ms",
+                               "prep p50 ms", "serialize p50 ms", "bytes p50")])
+            rows = [html.Tr([
+                html.Td(name), html.Td(s["count"]),
+                html.Td(f"{s['total']['p50']:.1f} / {s['total']['p95']:.1f}"),
+                html.Td(f"{s['prep']['p50']:.1f}"),
+                html.Td(f"{s['serialize']['p50']:.1f}"),
+                html.Td(f"{s['bytes']['p50']:.0f}"),
+            ]) for name, s in self.summary().items()]
+            return [header, *rows]
+
+        return html.Details([
+            html.Summary("Callback timings"),
+            html.Table(id="timings-table", style={"fontSize": "12px"}),
+            dcc.Interval(id="timings-poll", interval=interval_ms),
+        ], style={"fontFamily": "monospace", "margin": "10px"})
@@ -0,0 +1,153 @@
+"""
+data_registry.py – Process-wide, reference-counted store of decoded data.
+
+Adding the same file twice, to one viewer or to several viewers in the
+same process, used to decode and keep one copy per layer. A
+:class:`DataRegistry` keeps one copy per *product* of a file instead:
+
+* keys combine the file identity (real path, modification time and size,
+  see :func:`file_key`) with whatever describes the product, e.g. the
+  layer kind and render mode;
+* :meth:`DataRegistry.acquire` returns the stored value and adds a
+  reference, computing it on the first request only. Concurrent requests
+  for a key that is being computed wait for that computation instead of
+  starting their own;
+* :meth:`DataRegistry.release` drops a reference and forgets the value
+  once the last one is gone, so its memory is freed as soon as the
+  holders drop it too.
+
+Values are shared, not copied, so holders must treat them as read-only.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Callable, Hashable, Optional
+
+import numpy as np
+
+
+def file_key(filepath: str, *product: Hashable, companions: tuple = ()) -> tuple:
+    """Registry key of ``product`` of ``filepath``.
+
+    The file is identified by its real path, modification time and size,
+    so a file that changes on disk gets a new key. ``companions`` are other
+    files the product is read from (e.g. an edit journal); their
+    modification time and size, or None while they do not exist, are part
+    of the key too.
+    """
+    st = os.stat(filepath)
+    key = (os.path.realpath(filepath), st.st_mtime_ns, st.st_size, *product)
+    if companions:
+        key += (tuple(_stamp(path) for path in companions),)
+    return key
+
+
+def _stamp(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def data_nbytes(value) -> int:
+    """Bytes held by the arrays in ``value`` (nested dicts / lists / tuples)."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(data_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(data_nbytes(v) for v in value)
+    return int(getattr(value, "nbytes", 0))
+
+
+class DataRegistry:
+    """Reference-counted values keyed by :func:`file_key` (see module docstring)."""
+
+    def __init__(self):
+        self._entries: dict[Hashable, list] = {}  # key -> [value, refs]
+        self._loading: dict[Hashable, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def acquire(self, key: Hashable, compute: Callable[[], object]):
+        """Return the value of ``key`` with one more reference.
+
+        ``compute()`` is called if no value is stored yet; if it raises,
+        nothing is stored and the exception propagates.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry[1] += 1
+                    return entry[0]
+                event = self._loading.get(key)
+                if event is None:
+                    event = self._loading[key] = threading.Event()
+                    break
+            # Another thread is computing it; use its result (or retry if it failed)
+            event.wait()
+        try:
+            value = compute()
+        except BaseException:
+            with self._lock:
+                del self._loading[key]
+            event.set()
+            raise
+        with self._lock:
+            self._entries[key] = [value, 1]
+            del self._loading[key]
+        event.set()
+        return value
+
+    def release(self, key: Hashable) -> bool:
+        """Drop one reference; returns True if that freed the value."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            entry[1] -= 1
+            if entry[1] > 0:
+                return False
+            del self._entries[key]
+            return True
+
+    def refs(self, key: Hashable) -> int:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry is not None else 0
+
+    def stats(self) -> dict:
+        """Number of values, references and bytes held."""
+        with self._lock:
+            entries = list(self._entries.values())
+        return {"entries": len(entries),
+                "refs": sum(refs for _, refs in entries),
+                "nbytes": sum(data_nbytes(value) for value, _ in entries)}
+
+
+# ---------------------------------------------------------------------------
+# Process-wide default registry
+# ---------------------------------------------------------------------------
+
+_default_registry: Optional[DataRegistry] = None
+_default_lock = threading.Lock()
+
+
+def default_registry() -> DataRegistry:
+    """Return the registry shared by every viewer of this process."""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = DataRegistry()
+        return _default_registry
@@ -0,0 +1,29 @@
+// Keyboard shortcuts of the skeleton editor (minimall_dash_viewer.py).
+//
+//   Ctrl+Z (Cmd+Z)                     undo the last edit
+//   Ctrl+Shift+Z (Cmd+Shift+Z), Ctrl+Y redo
+//
+// The shortcuts click the Undo / Redo buttons, so they go through the same
+// Dash callback. They are ignored while typing in an input field.
+document.addEventListener('keydown', function (event) {
+    if (!(event.ctrlKey || event.metaKey) || event.altKey) {
+        return;
+    }
+    var target = event.target;
+    if (target && (target.tagName === 'INPUT' || target.tagName === 'TEXTAREA' ||
+                   target.isContentEditable)) {
+        return;
+    }
+    var key = event.key.toLowerCase();
+    var buttonId = null;
+    if (key === 'z') {
+        buttonId = event.shiftKey ? 'redo-button' : 'undo-button';
+    } else if (key === 'y' && !event.shiftKey) {
+        buttonId = 'redo-button';
+    }
+    var button = buttonId && document.getElementById(buttonId);
+    if (button) {
+        event.preventDefault();
+        button.click();
+    }
+});
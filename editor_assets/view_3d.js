@@ -0,0 +1,150 @@
+// Clientside callbacks of the 3D view of the skeleton editor
+// (minimall_dash_viewer.py).
+//
+// sliceOverlay moves the blue overlay of the selected Z slice. The label
+// voxels of every slice are shipped once in the 'slice-overlay-data' store
+// (see slice_overlay_data): base64 typed arrays of the x and y coordinates
+// sorted by z, and the per-slice offsets into them. They are decoded once
+// and cached here; a slider move then only swaps the coordinates of the
+// overlay trace (trace 2) for views of the new slice, without a server
+// round trip.
+//
+// skeletonTrace keeps the skeleton trace (trace 1) in step with the
+// session. The 'skeleton-trace' store carries either a snapshot of all the
+// points or the points added and removed by one edit (see
+// skeleton_trace_delta), tagged with session versions. A delta is applied
+// in one pass over the current coordinates; if it does not follow the
+// version the trace shows, an edit was missed and a snapshot is requested
+// through the 'skeleton-resync' store.
+//
+// Both pass the other traces through unchanged, so Plotly does not redraw
+// them.
+window.dash_clientside = window.dash_clientside || {};
+
+(function () {
+    // The dtype names of volume_utils.typed_array
+    var TYPES = {
+        int8: Int8Array, uint8: Uint8Array, int16: Int16Array,
+        uint16: Uint16Array, int32: Int32Array, uint32: Uint32Array,
+        float32: Float32Array, float64: Float64Array
+    };
+    var cached = null;
+
+    function decode(array) {
+        var binary = atob(array.bdata);
+        var bytes = new Uint8Array(binary.length);
+        for (var i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        return new TYPES[array.dtype](bytes.buffer);
+    }
+
+    function slices(data) {
+        if (!cached || cached.data !== data) {
+            cached = {
+                data: data,
+                xs: decode(data.xs),
+                ys: decode(data.ys),
+                offsets: decode(data.offsets)
+            };
+        }
+        return cached;
+    }
+
+    // Keep the camera the user rotated to
+    function keepCamera(layout, relayoutData) {
+        if (relayoutData && relayoutData['scene.camera']) {
+            return Object.assign({}, layout, {
+                scene: Object.assign({}, layout.scene,
+                                     {camera: relayoutData['scene.camera']})
+            });
+        }
+        return layout;
+    }
+
+    function withTrace(figure, index, trace, relayoutData) {
+        var traces = figure.data.slice();
+        traces[index] = trace;
+        return Object.assign({}, figure, {
+            data: traces, layout: keepCamera(figure.layout, relayoutData)
+        });
+    }
+
+    // Points of a delta or snapshot: {x, y, z} typed arrays
+    function points(data) {
+        return {x: decode(data.x), y: decode(data.y), z: decode(data.z)};
+    }
+
+    // Applies the removals, then the additions of a delta to the coordinates
+    // of a trace; points are identified by their flat voxel index
+    function applyDelta(trace, delta) {
+        var shape = delta.shape, ny = shape[1], nz = shape[2];
+        var add = points(delta.add), remove = points(delta.remove);
+        var removed = new Set();
+        for (var i = 0; i < remove.x.length; i++) {
+            removed.add((remove.x[i] * ny + remove.y[i]) * nz + remove.z[i]);
+        }
+        var x = trace.x || [], y = trace.y || [], z = trace.z || [];
+        var Type = shape[0] > 65536 || ny > 65536 || nz > 65536 ? Uint32Array : Uint16Array;
+        var out = {
+            x: new Type(x.length + add.x.length),
+            y: new Type(x.length + add.x.length),
+            z: new Type(x.length + add.x.length)
+        };
+        var n = 0;
+        for (var j = 0; j < x.length; j++) {
+            if (removed.size && removed.has((x[j] * ny + y[j]) * nz + z[j])) {
+                continue;
+            }
+            out.x[n] = x[j];
+            out.y[n] = y[j];
+            out.z[n] = z[j];
+            n++;
+        }
+        out.x.set(add.x, n);
+        out.y.set(add.y, n);
+        out.z.set(add.z, n);
+        n += add.x.length;
+        return {x: out.x.subarray(0, n), y: out.y.subarray(0, n), z: out.z.subarray(0, n)};
+    }
+
+    window.dash_clientside.skeletonEditor = {
+        sliceOverlay: function (z, data, figure, relayoutData) {
+            if (!data || !figure || z === null || z === undefined) {
+                return window.dash_clientside.no_update;
+            }
+            var index = slices(data);
+            var start = index.offsets[z], stop = index.offsets[z + 1];
+            var overlay = Object.assign({}, figure.data[2], {
+                x: index.xs.subarray(start, stop),
+                y: index.ys.subarray(start, stop),
+                z: new Uint16Array(stop - start).fill(z),
+                name: 'Slice ' + z + ' Overlay'
+            });
+            return withTrace(figure, 2, overlay, relayoutData);
+        },
+
+        skeletonTrace: function (data, figure, relayoutData) {
+            var skip = window.dash_clientside.no_update;
+            if (!data || !figure) {
+                return [skip, skip];
+            }
+            var trace = figure.data[1];
+            var version = trace.meta ? trace.meta.version : null;
+            var coords;
+            if (version !== null && (data.points ? data.to < version : data.to <= version)) {
+                // Older than what the trace shows (responses can arrive out of order)
+                return [skip, skip];
+            } else if (data.points) {
+                coords = points(data.points);
+            } else if (data.from !== version) {
+                // An edit was missed: ask the server for all the points
+                return [skip, {version: version, seen: data.to}];
+            } else {
+                coords = applyDelta(trace, data);
+            }
+            var updated = Object.assign({}, trace, coords, {meta: {version: data.to}});
+            return [withTrace(figure, 1, updated, relayoutData), skip];
+        }
+    };
+})();
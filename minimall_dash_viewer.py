@@ -1,25 +1,89 @@
+"""
+minimall_dash_viewer.py – Single-volume skeleton editor.
+
+Shows a segmentation and its skeleton side by side in a 3D view and a 2D
+Z-slice view, and lets the user add or remove skeleton points by clicking
+on the slice.
+
+Importing this module is cheap: it neither parses the command line nor
+loads data, and Dash, Plotly and scikit-image are only imported when an
+app is built. Use :func:`create_app` (or :class:`SkeletonEditor`) to
+build the app from Python, or run the module as a script::
+
+    python minimall_dash_viewer.py labels.nii.gz [--skeleton_filepath sk.npy]
+"""
+
 import os
-from dash import Dash, dcc, html, Input, Output, State, no_update
-import plotly.graph_objects as go
-import numpy as np
-import nibabel as nib
-from skimage.morphology import skeletonize
 import json
+import uuid
 import argparse  # <-- New import for arguments
+import numpy as np
+from callback_timing import CallbackTimings
+from session_store import MemorySessionStore, SQLiteSessionStore
+from slice_render import SliceImageCache, SlicePrefetcher
+from skeleton_thinning import cached_skeleton, recompute_region
+from volume_cache import cached
+from volume_utils import (RENDER_MODES, RENDER_MESH, DEFAULT_RENDER_MODE,
+                          DEFAULT_MESH_STEP, JOURNAL_ADD, JOURNAL_REMOVE,
+                          append_skeleton_edits, read_label_mask, read_nonzero_coords,
+                          read_skeleton, typed_array, write_skeleton, volume_mesh,
+                          volume_points)
+
+#: Session store kinds accepted by SkeletonEditor and --session_store
+SESSION_STORES = ("memory", "sqlite")
+
+#: Modes of the brush and box / lasso editing tools
+EDIT_ADD, EDIT_REMOVE = "add", "remove"
+
+#: Static files served with the editor app only
+EDITOR_ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "editor_assets")
+
+# Command-line arguments
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Dash app for vessel skeleton visualization")
+    parser.add_argument("labels_filepath",
+                        help="Path to the labels NIfTI file (mandatory).")
+    parser.add_argument("--skeleton_filepath",
+                        help="Optional path to the skeleton file (binary .npy or JSON).")
+    parser.add_argument("--volume_mode", choices=RENDER_MODES, default=DEFAULT_RENDER_MODE,
+                        help="Volume rendering: 'shell' draws boundary voxels only, "
+                             "'full' draws every foreground voxel, 'mesh' draws a surface mesh.")
+    parser.add_argument("--mesh_step", type=int, default=DEFAULT_MESH_STEP,
+                        help="Marching-cubes stride for --volume_mode mesh (larger is coarser).")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="Worker processes used to compute a missing skeleton "
+                             "(default: one per CPU).")
+    parser.add_argument("--session_store", choices=SESSION_STORES, default="memory",
+                        help="Where per-tab editing sessions are kept: 'memory' (one "
+                             "server process) or 'sqlite' (shared by several processes).")
+    parser.add_argument("--session_db",
+                        help="SQLite file for --session_store sqlite "
+                             "(default: next to the skeleton file).")
+    parser.add_argument("--max_sessions", type=int, default=None,
+                        help="Sessions kept in memory; the least recently used are "
+                             "dropped beyond that (default: no limit).")
+    parser.add_argument("--session_ttl", type=float, default=None,
+                        help="Seconds after which an unused session is dropped from "
+                             "memory (default: never).")
+    parser.add_argument("--timings", action="store_true",
+                        help="Time every callback; summaries are served at /_timings.")
+    parser.add_argument("--timings_panel", action="store_true",
+                        help="Like --timings, and show the summaries in the page.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    return parser
+
+# Works out where the skeleton of a labels file is saved and where it is
+# loaded from: (skeleton_filepath, skeleton_source)
+
 
-# Process command-line arguments
-parser = argparse.ArgumentParser(
-    description="Dash app for vessel skeleton visualization")
-parser.add_argument("labels_filepath",
-                    help="Path to the labels NIfTI file (mandatory).")
-parser.add_argument("--skeleton_filepath",
-                    help="Optional path to the skeleton JSON file.")
-args = parser.parse_args()
-
-labels_filepath = args.labels_filepath  # <-- Using the mandatory argument
-if args.skeleton_filepath:
-    skeleton_filepath = args.skeleton_filepath  # <-- If specified, use directly
-else:
+def resolve_skeleton_paths(labels_filepath, skeleton_filepath=None):
+    skeleton_source = None  # <-- File to load the skeleton from, if not skeleton_filepath
+    if skeleton_filepath:
+        return skeleton_filepath, skeleton_filepath  # <-- If specified, use directly
     try:
         base = os.path.basename(labels_filepath)
         # Remove known NIfTI extensions
@@ -33,68 +97,454 @@ else:
             number = parts[-1]
         else:
             number = "default"
-        skeleton_basename = f"modified_skeleton_{number}.json"
+        skeleton_basename = f"modified_skeleton_{number}.npy"
         skeleton_filepath = os.path.join(
             os.path.dirname(labels_filepath), skeleton_basename)
+        # Import a JSON skeleton from older sessions; edits are saved in binary form
+        legacy_json = skeleton_filepath[:-4] + '.json'
+        if not os.path.exists(skeleton_filepath) and os.path.exists(legacy_json):
+            skeleton_source = legacy_json
     except Exception as e:
-        skeleton_filepath = "../data/default_modified_skeleton.json"
+        skeleton_filepath = "../data/default_modified_skeleton.npy"
+    return skeleton_filepath, skeleton_source or skeleton_filepath
 
 # Function to load label data from a NIfTI file
+# Only voxels equal to 1 are kept. The file is read in its native dtype
+# (no float64 copy), Z-chunk by Z-chunk, and the result is served from
+# the on-disk volume cache after the first load.
 
 
 def load_labels(filepath):
-    labels_nib = nib.load(filepath)
-    labels = labels_nib.get_fdata().astype(np.uint8)
-
-    # labels = np.where(labels==1)
-    labels[labels > 1] = 0
-    return labels
+    return cached(filepath, 'mask', lambda: read_label_mask(filepath))
 
 # Displays the original volume in a 3D scatter plot
+# (by default only the boundary voxels, see volume_utils.surface_mask)
+# or as a decimated surface mesh when mode is 'mesh'
+
 
+def plot_volume(labels, alpha=0.05, mode=DEFAULT_RENDER_MODE,
+                mesh_step=DEFAULT_MESH_STEP, mesh_alpha=0.3):
+    import plotly.graph_objects as go
 
-def plot_volume(labels, alpha=0.05):
-    volume = np.where(labels == 1)  # TODO Change to use load_index function
+    if mode == RENDER_MESH:
+        verts, faces = volume_mesh(labels == 1, step_size=mesh_step)
+        return go.Mesh3d(
+            x=verts[:, 0], y=verts[:, 1], z=verts[:, 2],
+            i=faces[:, 0], j=faces[:, 1], k=faces[:, 2],
+            color='gray', opacity=mesh_alpha, flatshading=True,
+            name="Volume", showlegend=True
+        )
+    volume = volume_points(labels == 1, mode)
     scatter_volume = go.Scatter3d(
-        x=volume[0], y=volume[1], z=volume[2],
+        x=volume[:, 0], y=volume[:, 1], z=volume[:, 2],
         mode='markers',
         marker=dict(size=2, color='black', opacity=alpha),
         name="Volume"
     )
     return scatter_volume
 
-# Displays a 2D slice of labels along the Z axis
+# Per-Z index of voxel coordinates, used to look up slices without scanning
 
 
-def plot_z_slice(labels, slice_index):
-    z_slice = labels[:, :, slice_index]
-    x, y = np.where(z_slice)
-    scatter_slice = go.Scatter(
-        x=x, y=y,
-        mode='markers',
-        marker=dict(size=2, color='blue'),
+class SliceIndex:
+    """CSR-style index of voxel coordinates grouped by Z.
+
+    ``xs`` and ``ys`` hold the coordinates sorted by z and the points of
+    slice ``z`` are ``xs[offsets[z]:offsets[z + 1]]`` (same for ``ys``), so
+    a lookup returns two views without scanning or allocating. ``insert``
+    and ``delete`` keep the index up to date after single-point edits,
+    ``update`` after batches.
+    """
+
+    def __init__(self, xs, ys, offsets):
+        self.xs = xs
+        self.ys = ys
+        self.offsets = offsets
+
+    @classmethod
+    def from_mask(cls, mask):
+        """Index the non-zero voxels of a 3D mask."""
+        dtype = np.min_scalar_type(max(mask.shape) - 1)
+        # Z-major nonzero() returns coordinates already sorted by z
+        z, x, y = np.nonzero(np.moveaxis(mask, 2, 0))
+        counts = np.bincount(z, minlength=mask.shape[2])
+        return cls(x.astype(dtype), y.astype(dtype), cls._offsets(counts))
+
+    @classmethod
+    def from_points(cls, points, shape):
+        """Index an (N, 3) array of voxel coordinates in a volume of ``shape``."""
+        dtype = np.min_scalar_type(max(shape[:3]) - 1)
+        points = np.asarray(points).reshape(-1, 3)
+        order = np.argsort(points[:, 2], kind='stable')
+        counts = np.bincount(points[:, 2], minlength=shape[2])
+        return cls(points[order, 0].astype(dtype), points[order, 1].astype(dtype),
+                   cls._offsets(counts))
+
+    @staticmethod
+    def _offsets(counts):
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return offsets
+
+    def slice(self, z):
+        """Return the (xs, ys) views of the points in slice ``z``."""
+        start, stop = self.offsets[z], self.offsets[z + 1]
+        return self.xs[start:stop], self.ys[start:stop]
+
+    def insert(self, x, y, z):
+        pos = self.offsets[z + 1]
+        self.xs = np.insert(self.xs, pos, x)
+        self.ys = np.insert(self.ys, pos, y)
+        self.offsets[z + 1:] += 1
+
+    def delete(self, x, y, z):
+        start, stop = self.offsets[z], self.offsets[z + 1]
+        hits = np.flatnonzero((self.xs[start:stop] == x) & (self.ys[start:stop] == y))
+        if len(hits) == 0:
+            return False
+        pos = start + hits[0]
+        self.xs = np.delete(self.xs, pos)
+        self.ys = np.delete(self.ys, pos)
+        self.offsets[z + 1:] -= 1
+        return True
+
+    def update(self, added, removed):
+        """Insert and delete many (N, 3) points with one copy of the arrays.
+
+        Removed points must be present and added points absent.
+        """
+        nz = len(self.offsets) - 1
+        if len(removed):
+            positions = []
+            for z in np.unique(removed[:, 2]):
+                start, stop = self.offsets[z], self.offsets[z + 1]
+                in_slice = removed[removed[:, 2] == z]
+                keys = (self.xs[start:stop].astype(np.int64) << 32) | self.ys[start:stop]
+                hits = np.isin(keys, (in_slice[:, 0] << 32) | in_slice[:, 1])
+                positions.append(start + np.flatnonzero(hits))
+            positions = np.concatenate(positions)
+            self.xs = np.delete(self.xs, positions)
+            self.ys = np.delete(self.ys, positions)
+            self.offsets[1:] -= np.cumsum(np.bincount(removed[:, 2], minlength=nz))
+        if len(added):
+            added = added[np.argsort(added[:, 2], kind='stable')]
+            positions = self.offsets[added[:, 2] + 1]
+            self.xs = np.insert(self.xs, positions, added[:, 0].astype(self.xs.dtype))
+            self.ys = np.insert(self.ys, positions, added[:, 1].astype(self.ys.dtype))
+            self.offsets[1:] += np.cumsum(np.bincount(added[:, 2], minlength=nz))
+
+# Displays a 2D slice of labels along the Z axis as one image trace. The
+# slice is a small palette PNG taken from the LRU cache of encoded slices,
+# so the figure size no longer grows with the number of label pixels.
+
+
+def plot_z_slice(slice_images, slice_index):
+    import plotly.graph_objects as go
+
+    return go.Image(
+        source=slice_images.get(slice_index),
+        x0=0, dx=1, y0=0, dy=1,
+        hovertemplate="x=%{x}, y=%{y}<extra></extra>",
         name=f"Z Slice {slice_index}"
     )
-    return scatter_slice
 
-# Performs skeletonization and returns the reduced structure as a set of points
+# Performs skeletonization and returns the reduced structure as a set of points.
+# Connected components are thinned in parallel and the result is cached per
+# labels file content, so reopening the same labels does not recompute it.
+
+
+def load_thinning(labels, labels_filepath, processes=None):
+    return cached_skeleton(labels_filepath, labels, processes=processes)
+
+# Skeleton points with constant-time membership tests and toggling
+
+
+class SkeletonIndex:
+    """Mutable set of skeleton voxels backed by a hashed index.
+
+    Points are stored in a growable (capacity, 3) array and a dict maps the
+    encoded voxel key (the flat index of the voxel in a volume of ``shape``)
+    to its row. Adding appends a row and removing moves the last row into
+    the freed one, so both are O(1). ``points`` is a view of the used rows
+    and costs nothing to build. ``slices`` is a :class:`SliceIndex` of the
+    same points that is updated along with every edit.
+    """
+
+    def __init__(self, points, shape):
+        self.shape = tuple(int(n) for n in shape[:3])
+        self._build(points)
+
+    def _build(self, points):
+        pts = np.asarray(points, dtype=np.int64).reshape(-1, 3)
+        keys = np.ravel_multi_index(pts.T, self.shape) if len(pts) else np.empty(0, np.int64)
+        # Drop duplicates but keep the original order
+        _, first = np.unique(keys, return_index=True)
+        first.sort()
+        pts, keys = pts[first], keys[first]
+        self._pts = np.empty((max(2 * len(pts), 1024), 3), dtype=np.int64)
+        self._pts[:len(pts)] = pts
+        self._n = len(pts)
+        self._rows = dict(zip(keys.tolist(), range(self._n)))
+        self.slices = SliceIndex.from_points(pts, self.shape)
 
+    def key(self, point):
+        x, y, z = (int(c) for c in point)
+        return (x * self.shape[1] + y) * self.shape[2] + z
 
-def load_thinning(labels):
-    skeleton = skeletonize(labels)
-    skeleton_points = np.array(np.where(skeleton)).T
-    return skeleton_points
+    def __len__(self):
+        return self._n
 
-# Saves skeleton points to a JSON file
+    def __contains__(self, point):
+        return self.key(point) in self._rows
+
+    @property
+    def points(self):
+        """(N, 3) view of the current skeleton points."""
+        return self._pts[:self._n]
+
+    def add(self, point):
+        key = self.key(point)
+        if key in self._rows:
+            return False
+        self._append(key, point)
+        self.slices.insert(*point)
+        return True
+
+    def remove(self, point):
+        if not self._swap_remove(self.key(point)):
+            return False
+        self.slices.delete(*point)
+        return True
+
+    def _append(self, key, point):
+        if self._n == len(self._pts):
+            grown = np.empty((2 * len(self._pts), 3), dtype=self._pts.dtype)
+            grown[:self._n] = self._pts[:self._n]
+            self._pts = grown
+        self._pts[self._n] = point
+        self._rows[key] = self._n
+        self._n += 1
+
+    def _swap_remove(self, key):
+        """Remove the row of ``key`` by moving the last row into it."""
+        row = self._rows.pop(key, None)
+        if row is None:
+            return False
+        last = self._n - 1
+        if row != last:
+            self._pts[row] = self._pts[last]
+            self._rows[self.key(self._pts[row])] = row
+        self._n = last
+        return True
+
+    def toggle(self, point):
+        """Add the point if it is absent, remove it otherwise.
+
+        Returns True if the point was added.
+        """
+        if self.remove(point):
+            return False
+        self.add(point)
+        return True
+
+    def keys(self, points):
+        """Vectorised :meth:`key` of an (N, 3) array of points."""
+        points = np.asarray(points, dtype=np.int64).reshape(-1, 3)
+        return np.ravel_multi_index(points.T, self.shape) if len(points) else points[:, 0]
+
+    def update(self, add=(), remove=()):
+        """Add and remove many points at once.
+
+        Points in both ``add`` and ``remove`` are removed. Returns the
+        ``(added, removed)`` points that actually changed the set. The
+        hashed index is updated per point (swap-remove and append), and
+        the slice index in one vectorised pass, so the cost grows with
+        the number of edited points rather than the skeleton size.
+        """
+        add = np.asarray(add, dtype=np.int64).reshape(-1, 3)
+        remove = np.asarray(remove, dtype=np.int64).reshape(-1, 3)
+        remove_keys = self.keys(remove).tolist()
+        removed = [i for i, key in enumerate(remove_keys) if self._swap_remove(key)]
+        removed = remove[removed]
+        # Unique additions in input order that are neither present nor removed
+        dropped = set(remove_keys)
+        added = []
+        for i, key in enumerate(self.keys(add).tolist()):
+            if key not in dropped and key not in self._rows:
+                self._append(key, add[i])
+                added.append(i)
+        added = add[added]
+        self.slices.update(added, removed)
+        return added, removed
+
+# Saves skeleton points to a binary .npy file, or to JSON for other extensions
 
 
 def save_skeleton(skeleton_points, filename):
-    # Ensure a pure Python list is saved (JSON cannot serialize numpy arrays)
-    to_save = np.array(skeleton_points).tolist()
-    with open(filename, 'w') as f:
-        json.dump(to_save, f)
+    write_skeleton(skeleton_points, filename)
     print(f"Skeleton saved to {filename}")
 
+# Saves the edits of a session: appends them to the skeleton file's journal
+# (time proportional to the number of edits), or writes the whole skeleton
+# if the file does not exist yet
+
+
+def save_session(state, filename):
+    if os.path.exists(filename):
+        append_skeleton_edits(filename, state.pending.ops, state.pending.points)
+        print(f"Saved {len(state.pending)} edits to {filename}")
+    else:
+        save_skeleton(state.skeleton.points, filename)
+    state.pending.clear()
+    state.dirty = False
+
+# Toggles a skeleton point of a session and records the edit
+
+
+def toggle_session_point(state, point):
+    added = state.skeleton.toggle(point)
+    op = JOURNAL_ADD if added else JOURNAL_REMOVE
+    state.pending.append(op, point)
+    state.history.record([op], [point])
+    state.dirty = True
+    return added
+
+# Applies a group of point edits to a session (for undo and redo). A single
+# edit is one O(1) update of the skeleton index; larger groups (whose points
+# are distinct) are applied in one batched update.
+
+
+def apply_session_edits(state, ops, points):
+    if len(ops) == 1:
+        if ops[0] == JOURNAL_ADD:
+            state.skeleton.add(points[0])
+        else:
+            state.skeleton.remove(points[0])
+    else:
+        state.skeleton.update(add=points[ops == JOURNAL_ADD],
+                              remove=points[ops == JOURNAL_REMOVE])
+    state.pending.extend(ops, points)
+    state.dirty = True
+
+# Undoes / redoes the last edit group of a session; returns False if there is none
+
+
+def undo_session(state):
+    edits = state.history.undo()
+    if edits is None:
+        return False
+    apply_session_edits(state, *edits)
+    return True
+
+
+def redo_session(state):
+    edits = state.history.redo()
+    if edits is None:
+        return False
+    apply_session_edits(state, *edits)
+    return True
+
+# Pixels (K, 2) of a disk of the given radius around (cx, cy), clipped to a
+# slice of the given (nx, ny) shape
+
+
+def disk_pixels(cx, cy, radius, shape):
+    r = max(int(radius), 0)
+    dx, dy = np.mgrid[-r:r + 1, -r:r + 1]
+    inside = dx * dx + dy * dy <= r * r
+    pixels = np.stack([dx[inside] + int(cx), dy[inside] + int(cy)], axis=1)
+    return _clip_pixels(pixels, shape)
+
+# Pixels of a box given by its (x0, x1) and (y0, y1) ranges, inclusive
+
+
+def box_pixels(x_range, y_range, shape):
+    x0, x1 = sorted(x_range)
+    y0, y1 = sorted(y_range)
+    gx, gy = np.mgrid[int(np.ceil(x0)):int(np.floor(x1)) + 1,
+                      int(np.ceil(y0)):int(np.floor(y1)) + 1]
+    return _clip_pixels(np.stack([gx.ravel(), gy.ravel()], axis=1), shape)
+
+# Pixels whose centres lie inside a polygon (lasso), by the even-odd rule. The
+# test is vectorised over the pixels of the polygon's bounding box.
+
+
+def polygon_pixels(xs, ys, shape):
+    xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+    if len(xs) < 3:
+        return np.empty((0, 2), dtype=np.int64)
+    pixels = box_pixels((xs.min(), xs.max()), (ys.min(), ys.max()), shape)
+    px, py = pixels[:, 0], pixels[:, 1]
+    inside = np.zeros(len(pixels), dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for xa, ya, xb, yb in zip(xs, ys, np.roll(xs, 1), np.roll(ys, 1)):
+            crosses = (ya > py) != (yb > py)
+            inside ^= crosses & (px < (xb - xa) * (py - ya) / (yb - ya) + xa)
+    return pixels[inside]
+
+# Pixels of a box or lasso selection of the 2D view (its selectedData)
+
+
+def selection_pixels(selectedData, shape):
+    if not selectedData:
+        return None
+    if selectedData.get('lassoPoints'):
+        lasso = selectedData['lassoPoints']
+        return polygon_pixels(lasso['x'], lasso['y'], shape)
+    if selectedData.get('range'):
+        box = selectedData['range']
+        return box_pixels(box['x'], box['y'], shape)
+    return None
+
+
+def _clip_pixels(pixels, shape):
+    keep = (pixels >= 0).all(axis=1) & (pixels[:, 0] < shape[0]) & (pixels[:, 1] < shape[1])
+    return pixels[keep].astype(np.int64)
+
+# Extrudes slice pixels over the slices within depth of z: (M, 3) voxels
+
+
+def extrude_pixels(pixels, z, depth, nz):
+    zs = np.arange(max(z - depth, 0), min(z + depth + 1, nz))
+    return np.column_stack([np.tile(pixels, (len(zs), 1)), np.repeat(zs, len(pixels))])
+
+# Adds or removes every voxel of an (N, 3) point set in one edit. With a mask,
+# added points are snapped to it: only voxels inside the mask are added.
+
+
+def edit_session_points(state, points, mode, mask=None):
+    points = np.asarray(points, dtype=np.int64).reshape(-1, 3)
+    if mode == EDIT_ADD:
+        if mask is not None and len(points):
+            points = points[mask[points[:, 0], points[:, 1], points[:, 2]] != 0]
+        added, removed = state.skeleton.update(add=points)
+    else:
+        added, removed = state.skeleton.update(remove=points)
+    ops = np.concatenate([np.full(len(removed), JOURNAL_REMOVE), np.full(len(added), JOURNAL_ADD)])
+    changed = np.concatenate([removed, added])
+    if len(changed):
+        state.pending.extend(ops, changed)
+        state.history.record(ops, changed)
+        state.dirty = True
+    return len(added), len(removed)
+
+# Re-thins the labels inside a box for a session and records the changed points
+
+
+def recompute_session_region(state, labels, box):
+    old = state.skeleton.points
+    new = recompute_region(labels, old, box)
+    old_keys = np.ravel_multi_index(old.T, labels.shape) if len(old) else old[:, 0]
+    new_keys = np.ravel_multi_index(new.T, labels.shape) if len(new) else new[:, 0]
+    # Only the points that changed go through the index, not the whole skeleton
+    added, removed = state.skeleton.update(add=new[~np.isin(new_keys, old_keys)],
+                                           remove=old[~np.isin(old_keys, new_keys)])
+    ops = np.concatenate([np.full(len(removed), JOURNAL_REMOVE), np.full(len(added), JOURNAL_ADD)])
+    points = np.concatenate([removed, added])
+    state.pending.extend(ops, points)
+    state.history.record(ops, points)
+    state.dirty = True
+
 
 def load_skeleton_nifti_to_json(nifti_path, json_path=None):
     """
@@ -114,10 +564,8 @@ def load_skeleton_nifti_to_json(nifti_path, json_path=None):
     list
         List of [x,y,z] integer coordinates (as Python lists).
     """
-    nif = nib.load(nifti_path)
-    data = nif.get_fdata()
     # non-zero points indicate skeleton
-    coords = np.argwhere(data != 0)
+    coords = read_nonzero_coords(nifti_path)
     coords_list = coords.astype(int).tolist()
 
     if json_path is None:
@@ -144,166 +592,107 @@ def load_skeleton_nifti_to_json(nifti_path, json_path=None):
 # Function to generate the 2D slice figure
 
 
-def generate_slice_figure(slice_index, labels, skeleton_points):
-    scatter_slice = plot_z_slice(labels, slice_index)
-    # Filter skeleton points to show only those in the current Z slice
-    slice_skeleton_points = np.array(skeleton_points)
-    slice_skeleton_points = slice_skeleton_points[slice_skeleton_points[:, 2] == slice_index]
+def generate_slice_figure(slice_index, slice_images, skeleton_slices):
+    import plotly.graph_objects as go
 
-    # Create scatter plot for skeleton points in the Z slice
-    data = [scatter_slice]
-    if len(slice_skeleton_points) > 0:
-        scatter_skeleton_slice = go.Scatter(
-            x=slice_skeleton_points[:, 0],
-            y=slice_skeleton_points[:, 1],
-            mode='markers',
-            marker=dict(size=2, color='red'),
-            name="Skeleton Slice"
-        )
-        data.append(scatter_skeleton_slice)
+    image_slice = plot_z_slice(slice_images, slice_index)
+    # Skeleton points of the current Z slice, straight from the per-slice index
+    skeleton_x, skeleton_y = skeleton_slices.slice(slice_index)
+
+    # Create scatter plot for skeleton points in the Z slice. The trace is
+    # always present (possibly empty) so that edits can patch it by index.
+    scatter_skeleton_slice = go.Scatter(
+        x=skeleton_x,
+        y=skeleton_y,
+        mode='markers',
+        marker=dict(size=2, color='red'),
+        name="Skeleton Slice"
+    )
+    data = [image_slice, scatter_skeleton_slice]
 
     return {
         'data': data,
         'layout': go.Layout(
             title=f'2D Slice at Z={slice_index}',
-            width=800
+            width=800,
+            # Image traces reverse the y axis by default; keep y pointing up
+            yaxis=dict(autorange=True)
         )
     }
 
+# Returns a Patch that only replaces the skeleton points of the 2D slice view;
+# the label pixels and the zoom of the view are left untouched
 
-# Initialize the Dash app
-app = Dash(__name__, prevent_initial_callbacks=True)
 
-# Load label data and skeleton
-labels = load_labels(labels_filepath)  # <-- Using the labels_filepath argument
-scatter_volume = plot_volume(labels)
+def patch_skeleton_slice(skeleton_slices, slice_index):
+    from dash import Patch
 
-# Load skeleton from JSON or NIfTI file if it exists, otherwise compute by thinning
-if os.path.exists(skeleton_filepath):
-    # If the provided skeleton is a NIfTI file, convert to JSON and load
-    if skeleton_filepath.endswith('.nii') or skeleton_filepath.endswith('.nii.gz'):
-        coords_list, json_out = load_skeleton_nifti_to_json(skeleton_filepath)
-        skeleton_filepath = json_out
-        skeleton_points = np.array(coords_list)
-    else:
-        # Try to load as JSON (the typical expected format)
-        try:
-            skeleton_points = np.array(json.load(open(skeleton_filepath)))
-        except Exception:
-            # Fallback: attempt to interpret file as NIfTI if extension is ambiguous
-            try:
-                coords_list, json_out = load_skeleton_nifti_to_json(skeleton_filepath)
-                skeleton_filepath = json_out
-                skeleton_points = np.array(coords_list)
-            except Exception:
-                # Final fallback: compute thinning
-                print(f"Could not parse skeleton file '{skeleton_filepath}', computing thinning instead.")
-                skeleton_points = load_thinning(labels)
-                # ensure directory exists and save
-                dirpath = os.path.dirname(skeleton_filepath) or '.'
-                os.makedirs(dirpath, exist_ok=True)
-                save_skeleton(skeleton_points, skeleton_filepath)
-else:
-    skeleton_points = load_thinning(labels)
-    dirpath = os.path.dirname(skeleton_filepath) or '.'
-    os.makedirs(dirpath, exist_ok=True)
-    # Save computed skeleton to the chosen json path for later reuse
-    try:
-        save_skeleton(skeleton_points, skeleton_filepath)
-    except Exception as e:
-        print(f"Warning: could not save computed skeleton to {skeleton_filepath}: {e}")
-
-# Store skeleton points in a mutable list
-skeleton_points_list = skeleton_points.tolist()
-
-# Display the skeleton in 3D
-scatter_skeleton_3d = go.Scatter3d(
-    x=skeleton_points[:, 0], y=skeleton_points[:, 1], z=skeleton_points[:, 2],
-    mode='markers',
-    marker=dict(size=2, color='red', opacity=0.8),
-    name="Skeleton"
-)
-
-# Dictionary with skeletonization results
-skeletonization_results = {
-    'labels': labels,
-    'scatter_volume': scatter_volume,
-    'scatter_skeleton': scatter_skeleton_3d,
-    'skeleton_points': skeleton_points_list
-}
-z_slice = 0  # Initial Z slice
-
-# App layout
-app.layout = html.Div([
-    html.Div([
-        dcc.Graph(
-            id='3d-scatter-plot',
-            figure={
-                'data': [scatter_volume, scatter_skeleton_3d],
-                'layout': go.Layout(
-                    title='3D Scatter Plot of Volume with Skeleton',
-                    height=800,
-                )
-            },
-            style={'width': '100%'}
-        ),
-        dcc.Graph(
-            id='2d-slice-plot',
-            style={'width': '100%'}
-        ),
-    ], style={'display': 'flex', 'width': '100%'}),
-    dcc.Slider(
-        id="z-slider",
-        min=0,
-        max=labels.shape[2] - 1,
-        value=0,
-        step=1
-    ),
-    html.Button("Save Skeleton", id="save-button", n_clicks=0),
-    html.Div(id="save-message")
-])
-
-
-@app.callback(
-    Output('2d-slice-plot', 'figure'),
-    [Input('z-slider', 'value')],
-    State('2d-slice-plot', 'relayoutData')
-)
-def update_slice(slider_value, relayoutData):
-    global z_slice
-    z_slice = slider_value
-    figure = generate_slice_figure(
-        z_slice, labels, skeletonization_results['skeleton_points'])
-    if relayoutData:
-        if 'xaxis.range[0]' in relayoutData and 'xaxis.range[1]' in relayoutData:
-            figure['layout']['xaxis'] = {
-                'range': [relayoutData['xaxis.range[0]'], relayoutData['xaxis.range[1]']]}
-        if 'yaxis.range[0]' in relayoutData and 'yaxis.range[1]' in relayoutData:
-            figure['layout']['yaxis'] = {
-                'range': [relayoutData['yaxis.range[0]'], relayoutData['yaxis.range[1]']]}
-    return figure
+    skeleton_x, skeleton_y = skeleton_slices.slice(slice_index)
+    patch = Patch()
+    patch['data'][1]['x'] = skeleton_x
+    patch['data'][1]['y'] = skeleton_y
+    return patch
 
-# Updated callback for handling clicks on the 2D slice plot
-
-
-@app.callback(
-    Output('2d-slice-plot', 'figure', allow_duplicate=True),
-    [Input('2d-slice-plot', 'clickData')],
-    [State('z-slider', 'value'),
-     State('2d-slice-plot', 'relayoutData')]
-)
-def handle_click(clickData, slider_value, relayoutData):
-    if clickData:
-        point_data = clickData['points'][0]
-        x, y = int(point_data['x']), int(point_data['y'])
-        z = slider_value
-        point = [x, y, z]
-        if point in skeletonization_results['skeleton_points']:
-            skeletonization_results['skeleton_points'].remove(point)
-        else:
-            skeletonization_results['skeleton_points'].append(point)
-    figure = generate_slice_figure(
-        slider_value, labels, skeletonization_results['skeleton_points'])
+# Builds the blue overlay that highlights the selected slice in the 3D view
+
+
+def plot_slice_overlay(labels_index, slice_index):
+    import plotly.graph_objects as go
+
+    x, y = labels_index.slice(slice_index)
+    return go.Scatter3d(
+        x=x,
+        y=y,
+        z=np.full_like(x, slice_index),
+        mode='markers',
+        marker=dict(size=2, color='blue', opacity=0.1),
+        name=f"Slice {slice_index} Overlay"
+    )
+
+# Per-slice label voxels for the overlay clientside callback
+# (editor_assets/view_3d.js): the SliceIndex arrays as base64 typed
+# arrays, shipped to the browser once
+
+
+def slice_overlay_data(labels_index):
+    coord_dtype = np.uint16 if labels_index.xs.dtype.itemsize <= 2 else np.uint32
+    return {'xs': typed_array(labels_index.xs, coord_dtype),
+            'ys': typed_array(labels_index.ys, coord_dtype),
+            'offsets': typed_array(labels_index.offsets, np.uint32)}
+
+# Updates of the 3D skeleton trace for the skeleton trace clientside callback
+# (editor_assets/view_3d.js). An edit sends only the points it added and
+# removed, tagged with the session versions before and after it; the browser
+# applies them to its copy of the trace. A snapshot (all the points) is sent
+# when a session is opened or saved, and when the browser finds that it
+# missed an edit. Inside a sessions.edit block the version is the one before
+# the edit (the store increments it when the block ends).
+
+
+def _typed_points(points, shape):
+    points = np.asarray(points).reshape(-1, 3)
+    dtype = np.uint16 if max(shape[:3]) <= 1 << 16 else np.uint32
+    return {axis: typed_array(points[:, i], dtype) for i, axis in enumerate('xyz')}
+
+
+def skeleton_trace_delta(state, start, shape):
+    """Points added and removed by the edits in ``state.pending`` from ``start`` on."""
+    ops, points = state.pending.ops[start:], state.pending.points[start:]
+    return {'from': state.version, 'to': state.version + 1, 'shape': list(shape[:3]),
+            'add': _typed_points(points[ops == JOURNAL_ADD], shape),
+            'remove': _typed_points(points[ops == JOURNAL_REMOVE], shape)}
+
+
+def skeleton_trace_snapshot(state, shape, version=None):
+    """All the points of a session (at ``version``, by default its current one)."""
+    return {'to': state.version if version is None else version, 'shape': list(shape[:3]),
+            'points': _typed_points(state.skeleton.points, shape)}
+
+
+# Copies the zoom of the 2D slice view (its relayoutData) into a new figure
+
+
+def keep_2d_zoom(figure, relayoutData):
     if relayoutData:
         if 'xaxis.range[0]' in relayoutData and 'xaxis.range[1]' in relayoutData:
             figure['layout']['xaxis'] = {
@@ -313,60 +702,520 @@ def handle_click(clickData, slider_value, relayoutData):
                 'range': [relayoutData['yaxis.range[0]'], relayoutData['yaxis.range[1]']]}
     return figure
 
-# Callback to save the modified skeleton points when clicking the Save button
-
-
-@app.callback(
-    Output("3d-scatter-plot", "figure"),
-    [Input("save-button", "n_clicks"),
-     Input("z-slider", "value")],
-    [State("3d-scatter-plot", "relayoutData")]
-)
-def update_3d_plot(n_clicks, slider_value, relayoutData):
-    global z_slice
-    z_slice = slider_value
-
-    # Update dark overlay for the selected slice
-    slice_data = np.where(labels[:, :, slider_value] == 1)
-    dark_slice = go.Scatter3d(
-        x=slice_data[0],
-        y=slice_data[1],
-        z=np.full_like(slice_data[0], slider_value),
-        mode='markers',
-        marker=dict(size=2, color='blue', opacity=0.1),
-        name=f"Slice {slider_value} Overlay"
-    )
 
-    # Update skeleton trace from the stored skeleton points
-    skeleton_points = np.array(skeletonization_results['skeleton_points'])
-    scatter_skeleton = go.Scatter3d(
-        x=skeleton_points[:, 0],
-        y=skeleton_points[:, 1],
-        z=skeleton_points[:, 2],
-        mode='markers',
-        marker=dict(size=2, color='red', opacity=0.8),
-        name="Skeleton"
-    )
-    skeletonization_results['scatter_skeleton'] = scatter_skeleton
+class SkeletonEditor:
+    """Dash app for viewing and editing the skeleton of one segmentation.
 
-    # If the save button was clicked, save the skeleton to file.
-    if n_clicks > 0:
-        save_skeleton(skeletonization_results['skeleton_points'], filename=skeleton_filepath)
+    Creating an editor only records its settings. The labels and skeleton
+    are loaded by :meth:`load`, and the Dash app is built on first access
+    to :attr:`app`, so the editor can be constructed (and its helpers
+    reused) without paying for either.
 
-    # Build the layout and preserve camera view if provided.
-    layout = go.Layout(
-        title='3D Scatter Plot of Volume with Modified Skeleton',
-        height=800,
-    )
-    if relayoutData and 'scene.camera' in relayoutData:
-        layout.scene = dict(camera=relayoutData['scene.camera'])
+    Every browser tab is an editing session with its own copy of the
+    skeleton, kept in a session store (see :mod:`session_store`):
+    ``"memory"`` for a single server process, or ``"sqlite"`` (in
+    ``session_db``) when several server processes serve the app. New
+    sessions start from the skeleton file. ``max_sessions`` and
+    ``session_ttl`` bound the sessions held in memory (see
+    :class:`session_store.MemorySessionStore`).
 
-    return {
-        'data': [scatter_volume, scatter_skeleton, dark_slice],
-        'layout': layout
-    }
-    return no_update
+    With ``timings`` (or ``timings_panel``, which also adds an in-page
+    table) every callback is timed, see :mod:`callback_timing`.
+    """
+
+    def __init__(self, labels_filepath, skeleton_filepath=None,
+                 volume_mode=DEFAULT_RENDER_MODE, mesh_step=DEFAULT_MESH_STEP,
+                 processes=None, session_store="memory", session_db=None,
+                 max_sessions=None, session_ttl=None, timings=False, timings_panel=False):
+        if session_store not in SESSION_STORES:
+            raise ValueError(f"Unknown session store {session_store!r}; "
+                             f"expected one of {SESSION_STORES}")
+        self.labels_filepath = labels_filepath
+        self.skeleton_filepath, self.skeleton_source = resolve_skeleton_paths(
+            labels_filepath, skeleton_filepath)
+        self.volume_mode = volume_mode
+        self.mesh_step = mesh_step
+        self.processes = processes
+        self.session_store = session_store
+        self.session_db = session_db or (
+            os.path.splitext(self.skeleton_filepath)[0] + ".sessions.sqlite")
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.labels = None
+        self.labels_index = None
+        self.slice_images = None
+        self.slice_prefetcher = None
+        self.skeleton_points = None
+        self.scatter_volume = None
+        self.sessions = None
+        self.timings = CallbackTimings() if timings or timings_panel else None
+        self.timings_panel = timings_panel
+        self._app = None
+
+    # -- data ---------------------------------------------------------------
+
+    def load(self):
+        """Load the labels and the skeleton (computing it if needed). Idempotent."""
+        if self.labels is not None:
+            return self
+        self.labels = load_labels(self.labels_filepath)
+        self.labels_index = SliceIndex.from_mask(self.labels == 1)  # per-Z lookup of label voxels
+        # Label slices encoded as PNG images, shared by all sessions
+        self.slice_images = SliceImageCache(self.labels_index.slice, self.labels.shape)
+        self.slice_prefetcher = SlicePrefetcher(self.slice_images, self.labels.shape[2])
+        self.scatter_volume = plot_volume(self.labels, mode=self.volume_mode,
+                                          mesh_step=self.mesh_step)
+        self.skeleton_points = np.asarray(self._load_skeleton_points()).reshape(-1, 3)
+        self.sessions = self._make_session_store()
+        return self
+
+    def _load_skeleton_points(self):
+        """Load the skeleton from binary, JSON or NIfTI, otherwise compute it by thinning."""
+        source = self.skeleton_source
+        if os.path.exists(source):
+            # If the provided skeleton is a NIfTI file, convert to JSON and load
+            if source.endswith('.nii') or source.endswith('.nii.gz'):
+                coords_list, self.skeleton_filepath = load_skeleton_nifti_to_json(source)
+                return np.array(coords_list)
+            # Try to load as binary .npy or JSON (the typical expected formats)
+            try:
+                return read_skeleton(source)
+            except Exception:
+                pass
+            # Fallback: attempt to interpret file as NIfTI if extension is ambiguous
+            try:
+                coords_list, self.skeleton_filepath = load_skeleton_nifti_to_json(source)
+                return np.array(coords_list)
+            except Exception:
+                print(f"Could not parse skeleton file '{self.skeleton_filepath}', "
+                      "computing thinning instead.")
+        skeleton_points = load_thinning(self.labels, self.labels_filepath, self.processes)
+        # Save computed skeleton for later reuse
+        try:
+            save_skeleton(skeleton_points, self.skeleton_filepath)
+        except Exception as e:
+            print(f"Warning: could not save computed skeleton to {self.skeleton_filepath}: {e}")
+        return skeleton_points
+
+    def _base_points(self):
+        """Points a new session starts from: the latest saved skeleton."""
+        if os.path.exists(self.skeleton_filepath):
+            try:
+                return read_skeleton(self.skeleton_filepath)
+            except Exception:
+                pass
+        return self.skeleton_points
+
+    def _make_session_store(self):
+        # Store skeleton points in a hashed index for O(1) edits
+        def make_skeleton(points):
+            return SkeletonIndex(points, self.labels.shape)
+
+        if self.session_store == "sqlite":
+            return SQLiteSessionStore(self.session_db, make_skeleton, self._base_points,
+                                      max_sessions=self.max_sessions, ttl=self.session_ttl)
+        return MemorySessionStore(make_skeleton, self._base_points,
+                                  max_sessions=self.max_sessions, ttl=self.session_ttl)
+
+    # -- session operations ---------------------------------------------------
+
+    def toggle_point(self, session_id, point):
+        """Add or remove one skeleton point; returns True if it was added."""
+        with self.sessions.edit(session_id) as state:
+            return toggle_session_point(state, point)
+
+    def save(self, session_id):
+        """Save a session's edits to the skeleton file (see :func:`save_session`)."""
+        with self.sessions.edit(session_id) as state:
+            save_session(state, self.skeleton_filepath)
+
+    def recompute_region(self, session_id, box):
+        """Re-thin the labels inside ``box`` and replace the session's skeleton points there."""
+        with self.sessions.edit(session_id) as state:
+            recompute_session_region(state, self.labels, box)
+
+    def undo(self, session_id):
+        """Undo the last edit of a session; returns False if there was none."""
+        with self.sessions.edit(session_id) as state:
+            return undo_session(state)
+
+    def redo(self, session_id):
+        """Redo the last undone edit of a session; returns False if there was none."""
+        with self.sessions.edit(session_id) as state:
+            return redo_session(state)
+
+    def slice_cache_stats(self):
+        """Hit / miss counters of the 2D slice image cache and its prefetcher."""
+        return self.slice_prefetcher.stats()
+
+    # -- Dash app -------------------------------------------------------------
+
+    @property
+    def app(self):
+        """The Dash app; data is loaded and the app built on first access."""
+        if self._app is None:
+            self._app = self.load()._build_app()
+        return self._app
+
+    def _build_app(self):
+        import plotly.graph_objects as go
+        from dash import (Dash, dcc, html, Input, Output, State, ClientsideFunction,
+                          callback_context, no_update)
+
+        labels, labels_index = self.labels, self.labels_index
+        slice_images, prefetcher = self.slice_images, self.slice_prefetcher
+        skeleton_points = self.skeleton_points
+        sessions = self.sessions
+
+        # Editor-only assets (keyboard shortcuts); kept out of the default
+        # assets folder so that other apps in this directory don't load them
+        app = Dash(__name__, prevent_initial_callbacks=True, assets_folder=EDITOR_ASSETS)
+        if self.timings is not None:
+            self.timings.instrument(app)
+
+        # Display the skeleton in 3D. The points of the session are filled in by
+        # the skeleton trace clientside callback once the page knows its session.
+        scatter_skeleton_3d = go.Scatter3d(
+            x=[], y=[], z=[],
+            mode='markers',
+            marker=dict(size=2, color='red', opacity=0.8),
+            name="Skeleton"
+        )
+
+        # Trace order of the 3D figure is fixed (volume, skeleton, slice overlay) so
+        # that callbacks can patch individual traces by index.
+        shape = labels.shape[:3]
+
+        # Label voxels of every slice for the overlay, encoded once per app
+        overlay_data = slice_overlay_data(labels_index)
+
+        # App layout
+        page = [
+            html.Div([
+                dcc.Graph(
+                    id='3d-scatter-plot',
+                    figure={
+                        'data': [self.scatter_volume, scatter_skeleton_3d,
+                                 plot_slice_overlay(labels_index, 0)],
+                        'layout': go.Layout(
+                            title='3D Scatter Plot of Volume with Skeleton',
+                            height=800,
+                        )
+                    },
+                    style={'width': '100%'}
+                ),
+                dcc.Graph(
+                    id='2d-slice-plot',
+                    figure=generate_slice_figure(
+                        0, slice_images, SliceIndex.from_points(skeleton_points, labels.shape)),
+                    style={'width': '100%'}
+                ),
+            ], style={'display': 'flex', 'width': '100%'}),
+            dcc.Slider(
+                id="z-slider",
+                min=0,
+                max=labels.shape[2] - 1,
+                value=0,
+                step=1
+            ),
+            html.Div([
+                html.Label("Tool: "),
+                dcc.RadioItems(
+                    id='edit-tool',
+                    options=[{'label': ' Point ', 'value': 'point'},
+                             {'label': ' Brush ', 'value': 'brush'},
+                             {'label': ' Box / lasso ', 'value': 'select'}],
+                    value='point', inline=True),
+                dcc.RadioItems(
+                    id='edit-mode',
+                    options=[{'label': ' Add ', 'value': EDIT_ADD},
+                             {'label': ' Remove ', 'value': EDIT_REMOVE}],
+                    value=EDIT_ADD, inline=True),
+                html.Label(" Brush radius: "),
+                dcc.Input(id="brush-radius", type="number", min=0, step=1, value=3),
+                html.Label(" Edit Z half-depth: "),
+                dcc.Input(id="edit-depth", type="number", min=0, step=1, value=0),
+                dcc.Checklist(
+                    id='snap-to-labels',
+                    options=[{'label': ' Snap to labels', 'value': 'snap'}],
+                    value=['snap'], inline=True),
+            ], style={'display': 'flex', 'gap': '8px', 'alignItems': 'center'}),
+            html.Button("Save Skeleton", id="save-button", n_clicks=0),
+            html.Button("Undo", id="undo-button", n_clicks=0, title="Ctrl+Z"),
+            html.Button("Redo", id="redo-button", n_clicks=0, title="Ctrl+Shift+Z / Ctrl+Y"),
+            html.Button("Recompute region", id="recompute-button", n_clicks=0),
+            html.Label(" Recompute Z half-depth: "),
+            dcc.Input(id="recompute-depth", type="number", min=0, step=1, value=5),
+            html.Div(id="save-message")
+        ]
+        if self.timings_panel:
+            page.append(self.timings.panel(app))
+
+        # The layout is rebuilt per page load so that every new tab gets its
+        # own session id; a reloaded tab keeps its id (session storage).
+        def layout():
+            return html.Div([
+                dcc.Store(id='session-id', storage_type='session', data=uuid.uuid4().hex),
+                dcc.Store(id='slice-overlay-data', data=overlay_data),
+                dcc.Store(id='skeleton-trace'),
+                dcc.Store(id='skeleton-resync'),
+                *page,
+            ])
+
+        app.layout = layout
+
+        # Counters of the slice image cache, for tuning the prefetching
+        @app.server.route('/slice-cache-stats')
+        def slice_cache_stats():
+            return self.slice_cache_stats()
+
+        prefetcher.notify(0)
+
+        # Shows the session's skeleton (which may differ from the file) once
+        # the page knows its session id
+
+        @app.callback(
+            Output('2d-slice-plot', 'figure', allow_duplicate=True),
+            Output('skeleton-trace', 'data', allow_duplicate=True),
+            [Input('session-id', 'data')],
+            [State('z-slider', 'value')],
+            prevent_initial_call='initial_duplicate'
+        )
+        def sync_session(session_id, slider_value):
+            with sessions.view(session_id) as state:
+                return (patch_skeleton_slice(state.skeleton.slices, slider_value),
+                        skeleton_trace_snapshot(state, shape))
+
+        # Sends all the points again when the browser missed an edit of the 3D
+        # skeleton trace (see skeleton_trace_delta)
+
+        @app.callback(
+            Output('skeleton-trace', 'data', allow_duplicate=True),
+            [Input('skeleton-resync', 'data')],
+            [State('session-id', 'data')]
+        )
+        def resync_skeleton_trace(request, session_id):
+            with sessions.view(session_id) as state:
+                return skeleton_trace_snapshot(state, shape)
+
+        @app.callback(
+            Output('2d-slice-plot', 'figure'),
+            [Input('z-slider', 'value')],
+            [State('2d-slice-plot', 'relayoutData'),
+             State('session-id', 'data')]
+        )
+        def update_slice(slider_value, relayoutData, session_id):
+            with sessions.view(session_id) as state:
+                figure = generate_slice_figure(slider_value, slice_images,
+                                               state.skeleton.slices)
+            # Encode the neighbouring slices while the user keeps scrubbing
+            prefetcher.notify(slider_value)
+            return keep_2d_zoom(figure, relayoutData)
+
+        # Applies a brush stroke or a box / lasso selection to the slices within
+        # the edit depth of the current one, in one vectorised edit
+
+        def edit_region(session_id, pixels, z, mode, depth, snap):
+            points = extrude_pixels(pixels, z, int(depth or 0), labels.shape[2])
+            with sessions.edit(session_id) as state:
+                start = len(state.pending)
+                added, removed = edit_session_points(
+                    state, points, mode, mask=labels if snap else None)
+                # Only the skeleton traces change
+                updates = (patch_skeleton_slice(state.skeleton.slices, z),
+                           skeleton_trace_delta(state, start, shape))
+            return (*updates, f"Added {added} and removed {removed} skeleton points")
+
+        # Updated callback for handling clicks on the 2D slice plot
+
+        @app.callback(
+            Output('2d-slice-plot', 'figure', allow_duplicate=True),
+            Output('skeleton-trace', 'data', allow_duplicate=True),
+            Output('save-message', 'children', allow_duplicate=True),
+            [Input('2d-slice-plot', 'clickData')],
+            [State('z-slider', 'value'),
+             State('edit-tool', 'value'),
+             State('edit-mode', 'value'),
+             State('brush-radius', 'value'),
+             State('edit-depth', 'value'),
+             State('snap-to-labels', 'value'),
+             State('session-id', 'data')]
+        )
+        def handle_click(clickData, slider_value, tool, mode, radius, depth, snap,
+                         session_id):
+            if not clickData:
+                return no_update, no_update, no_update
+            point_data = clickData['points'][0]
+            x, y = int(point_data['x']), int(point_data['y'])
+            z = slider_value
+            if tool == 'brush':
+                pixels = disk_pixels(x, y, radius or 0, labels.shape[:2])
+                return edit_region(session_id, pixels, z, mode, depth, snap)
+            if tool == 'select':
+                return no_update, no_update, no_update
+            with sessions.edit(session_id) as state:
+                start = len(state.pending)
+                toggle_session_point(state, (x, y, z))
+                # Only the skeleton traces change
+                return (patch_skeleton_slice(state.skeleton.slices, z),
+                        skeleton_trace_delta(state, start, shape), no_update)
+
+        # Box / lasso selections on the 2D slice plot (with the select tool)
+
+        @app.callback(
+            Output('2d-slice-plot', 'figure', allow_duplicate=True),
+            Output('skeleton-trace', 'data', allow_duplicate=True),
+            Output('save-message', 'children', allow_duplicate=True),
+            [Input('2d-slice-plot', 'selectedData')],
+            [State('z-slider', 'value'),
+             State('edit-tool', 'value'),
+             State('edit-mode', 'value'),
+             State('edit-depth', 'value'),
+             State('snap-to-labels', 'value'),
+             State('session-id', 'data')]
+        )
+        def handle_selection(selectedData, slider_value, tool, mode, depth, snap, session_id):
+            pixels = selection_pixels(selectedData, labels.shape[:2])
+            if tool != 'select' or pixels is None:
+                return no_update, no_update, no_update
+            return edit_region(session_id, pixels, slider_value, mode, depth, snap)
+
+        # Undo / redo buttons (also bound to Ctrl+Z and Ctrl+Shift+Z / Ctrl+Y
+        # by editor_assets/shortcuts.js)
+
+        @app.callback(
+            Output('2d-slice-plot', 'figure', allow_duplicate=True),
+            Output('skeleton-trace', 'data', allow_duplicate=True),
+            Output('save-message', 'children', allow_duplicate=True),
+            [Input('undo-button', 'n_clicks'),
+             Input('redo-button', 'n_clicks')],
+            [State('z-slider', 'value'),
+             State('session-id', 'data')]
+        )
+        def undo_redo(undo_clicks, redo_clicks, slider_value, session_id):
+            trigger = callback_context.triggered[0]['prop_id'].split('.')[0]
+            action = undo_session if trigger == 'undo-button' else redo_session
+            with sessions.edit(session_id) as state:
+                start = len(state.pending)
+                if not action(state):
+                    # Still send an (empty) delta: the session's version moves on
+                    return (no_update, skeleton_trace_delta(state, start, shape),
+                            f"Nothing to {trigger.split('-')[0]}")
+                return (patch_skeleton_slice(state.skeleton.slices, slider_value),
+                        skeleton_trace_delta(state, start, shape), "")
+
+        # Re-thins the region shown in the 2D view (its visible x/y range and the
+        # slices within the chosen depth of the current one) after manual edits
+
+        @app.callback(
+            Output('2d-slice-plot', 'figure', allow_duplicate=True),
+            Output('skeleton-trace', 'data', allow_duplicate=True),
+            Output('save-message', 'children'),
+            [Input('recompute-button', 'n_clicks')],
+            [State('z-slider', 'value'),
+             State('recompute-depth', 'value'),
+             State('2d-slice-plot', 'relayoutData'),
+             State('session-id', 'data')]
+        )
+        def recompute_region_callback(n_clicks, slider_value, depth, relayoutData, session_id):
+            nx, ny, nz = labels.shape[:3]
+            x_range, y_range = (0, nx), (0, ny)
+            relayoutData = relayoutData or {}
+            if 'xaxis.range[0]' in relayoutData and 'xaxis.range[1]' in relayoutData:
+                x_range = (int(np.floor(relayoutData['xaxis.range[0]'])),
+                           int(np.ceil(relayoutData['xaxis.range[1]'])) + 1)
+            if 'yaxis.range[0]' in relayoutData and 'yaxis.range[1]' in relayoutData:
+                y_range = (int(np.floor(relayoutData['yaxis.range[0]'])),
+                           int(np.ceil(relayoutData['yaxis.range[1]'])) + 1)
+            depth = int(depth or 0)
+            box = (x_range, y_range, (slider_value - depth, slider_value + depth + 1))
+            with sessions.edit(session_id) as state:
+                start = len(state.pending)
+                recompute_session_region(state, labels, box)
+                figure = patch_skeleton_slice(state.skeleton.slices, slider_value)
+                delta = skeleton_trace_delta(state, start, shape)
+            message = (f"Recomputed skeleton in x {box[0]}, y {box[1]}, "
+                       f"z [{max(box[2][0], 0)}, {min(box[2][1], nz)})")
+            return figure, delta, message
+
+        # Moves the dark overlay of the selected slice in the browser
+        # (editor_assets/view_3d.js); slider moves don't reach the server
+        # for the 3D view
+
+        app.clientside_callback(
+            ClientsideFunction(namespace='skeletonEditor', function_name='sliceOverlay'),
+            Output('3d-scatter-plot', 'figure', allow_duplicate=True),
+            [Input('z-slider', 'value')],
+            [State('slice-overlay-data', 'data'),
+             State('3d-scatter-plot', 'figure'),
+             State('3d-scatter-plot', 'relayoutData')]
+        )
+
+        # Applies the skeleton trace updates to the 3D view in the browser
+        # (editor_assets/view_3d.js), asking for a snapshot if one was missed
+
+        app.clientside_callback(
+            ClientsideFunction(namespace='skeletonEditor', function_name='skeletonTrace'),
+            Output('3d-scatter-plot', 'figure', allow_duplicate=True),
+            Output('skeleton-resync', 'data'),
+            [Input('skeleton-trace', 'data')],
+            [State('3d-scatter-plot', 'figure'),
+             State('3d-scatter-plot', 'relayoutData')]
+        )
+
+        # Callback to save the modified skeleton points when clicking the Save button
+
+        @app.callback(
+            Output('skeleton-trace', 'data', allow_duplicate=True),
+            Output('save-message', 'children', allow_duplicate=True),
+            [Input("save-button", "n_clicks")],
+            [State('session-id', 'data')]
+        )
+        def update_3d_plot(n_clicks, session_id):
+            # Save the skeleton and resynchronise the 3D skeleton trace with it;
+            # the volume trace is never resent.
+            with sessions.edit(session_id) as state:
+                save_session(state, self.skeleton_filepath)
+                snapshot = skeleton_trace_snapshot(state, shape, state.version + 1)
+            return snapshot, f"Skeleton saved to {self.skeleton_filepath}"
+
+        return app
+
+    def run(self, host="127.0.0.1", port=8050, debug=True):
+        """Load the data, build the app and start the Dash server (blocking)."""
+        self.app.run(host=host, port=port, debug=debug)
+
+# Builds the editor app for a labels file; data is loaded here, not at import
+
+
+def create_app(labels_filepath, skeleton_filepath=None, volume_mode=DEFAULT_RENDER_MODE,
+               mesh_step=DEFAULT_MESH_STEP, processes=None, session_store="memory",
+               session_db=None, max_sessions=None, session_ttl=None, timings=False,
+               timings_panel=False):
+    return SkeletonEditor(labels_filepath, skeleton_filepath, volume_mode=volume_mode,
+                          mesh_step=mesh_step, processes=processes,
+                          session_store=session_store, session_db=session_db,
+                          max_sessions=max_sessions, session_ttl=session_ttl,
+                          timings=timings, timings_panel=timings_panel).app
+
+# WSGI entry point for multi-worker servers, e.g.
+#   gunicorn -w 4 'minimall_dash_viewer:create_server("labels.nii.gz", session_store="sqlite")'
+
+
+def create_server(labels_filepath, **kwargs):
+    return create_app(labels_filepath, **kwargs).server
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    editor = SkeletonEditor(args.labels_filepath, args.skeleton_filepath,
+                            volume_mode=args.volume_mode, mesh_step=args.mesh_step,
+                            processes=args.processes, session_store=args.session_store,
+                            session_db=args.session_db, max_sessions=args.max_sessions,
+                            session_ttl=args.session_ttl, timings=args.timings,
+                            timings_panel=args.timings_panel)
+    editor.run(host=args.host, port=args.port)
 
 
 if __name__ == '__main__':
-    app.run_server(debug=True)
+    main()
@@ -16,6 +16,7 @@ Usage from the command line
     python multi_viewer.py                          # empty viewer
     python multi_viewer.py seg.nii.gz               # open with one volume
     python multi_viewer.py seg.nii.gz --skeleton sk.json  # volume + skeleton
+    python multi_viewer.py a.nii.gz b.nii.gz --processes 4  # parallel decoding
 
 Usage as a library
 ------------------
@@ -24,6 +25,7 @@ Usage as a library
     viewer = MultiViewer()
     viewer.add_volume("path/to/seg.nii.gz")
     viewer.add_skeleton("path/to/skeleton.json")
+    viewer.add_many(["a.nii.gz", "b.nii.gz"])   # decoded in worker processes
     viewer.run()                       # blocking – opens browser
     # or
     viewer.run(port=8051, open_browser=False)
@@ -32,17 +34,40 @@ Usage as a library
 from __future__ import annotations
 
 import argparse
-import json
+import math
 import os
 import uuid
 import webbrowser
-from threading import Timer
-from typing import Optional
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+import time
+from threading import RLock, Timer
+from typing import Iterable, NamedTuple, Optional
 
-import nibabel as nib
 import numpy as np
 import plotly.graph_objects as go
-from dash import Dash, Input, Output, State, callback_context, dcc, html, no_update
+from dash import Dash, Input, Output, Patch, State, callback_context, dcc, html, no_update
+
+from callback_timing import CallbackTimings
+from data_registry import DataRegistry, data_nbytes, default_registry, file_key
+from volume_cache import cached
+from volume_utils import (
+    DEFAULT_MESH_STEP,
+    DEFAULT_RENDER_MODE,
+    RENDER_MESH,
+    RENDER_MODES,
+    SKELETON_BINARY_EXT,
+    ProgressCallback,
+    apply_skeleton_journal,
+    compact_coords,
+    read_label_mask,
+    read_skeleton,
+    skeleton_journal_path,
+    typed_array,
+    volume_mesh,
+    volume_points,
+)
 
 # ---------------------------------------------------------------------------
 # Colour palette for auto-assigning colours to layers
@@ -53,38 +78,157 @@ _PALETTE = [
     "#aec7e8", "#ffbb78", "#98df8a", "#ff9896", "#c5b0d5",
 ]
 
+# Mesh surfaces are opaque objects, so the point-cloud default of 0.05
+# would make them practically invisible.
+_DEFAULT_MESH_OPACITY = 0.3
+
 # ---------------------------------------------------------------------------
 # Data-loading helpers (reused from the original viewer)
 # ---------------------------------------------------------------------------
 
 
-def _load_nifti_volume(filepath: str) -> np.ndarray:
-    """Load a NIfTI segmentation and return a binary uint8 array."""
-    data = nib.load(filepath).get_fdata().astype(np.uint8)
-    data[data > 1] = 0
-    return data
+def _load_nifti_volume(
+    filepath: str,
+    progress: Optional[ProgressCallback] = None,
+) -> np.ndarray:
+    """Load a NIfTI segmentation and return a binary uint8 array.
+
+    The array comes from the on-disk volume cache when possible and is
+    then a read-only memory map.
+    """
+    return cached(filepath, "mask",
+                  lambda: read_label_mask(filepath, progress=progress))
 
 
-def _load_skeleton(filepath: str) -> np.ndarray:
-    """Load skeleton points from a JSON or NIfTI file.
+def _load_skeleton(
+    filepath: str,
+    progress: Optional[ProgressCallback] = None,
+) -> np.ndarray:
+    """Load skeleton points from a binary (.npy), JSON or NIfTI file.
 
-    Returns an (N, 3) int array of coordinates.
+    Returns an (N, 3) int array of coordinates. Binary skeletons are
+    memory-mapped directly (unless they have an edit journal); the other
+    formats are served from the on-disk volume cache when possible.
     """
-    if filepath.endswith(".json"):
-        with open(filepath) as f:
-            pts = json.load(f)
-        return np.array(pts, dtype=int)
+    if filepath.endswith(SKELETON_BINARY_EXT):
+        return read_skeleton(filepath)
+    # Only the base file is cached; saved edits are replayed from its journal
+    points = cached(filepath, "coords",
+                    lambda: read_skeleton(filepath, progress=progress, journal=False))
+    return apply_skeleton_journal(filepath, points)
+
+
+class _PointColumns:
+    """Voxel coordinates stored as separate x, y and z columns.
+
+    The columns use the smallest integer type that fits the coordinates
+    (uint16 for image coordinates, see :func:`compact_coords`): 6 bytes
+    per point instead of 24 for an int64 (N, 3) array. They are handed to
+    figures as they are, so no per-axis copy is made per figure.
+    """
+
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, z: np.ndarray):
+        self.x, self.y, self.z = x, y, z
+
+    @classmethod
+    def from_array(cls, points) -> "_PointColumns":
+        """Split an (N, 3) coordinate array into compact columns."""
+        points = compact_coords(points)
+        return cls(*(np.ascontiguousarray(points[:, i]) for i in range(3)))
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    @property
+    def columns(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.x, self.y, self.z
+
+    @property
+    def nbytes(self) -> int:
+        return sum(c.nbytes for c in self.columns)
+
+    def take(self, indices: np.ndarray) -> "_PointColumns":
+        return _PointColumns(*(c[indices] for c in self.columns))
+
+    def bounds(self) -> tuple[np.ndarray, np.ndarray]:
+        """Per-axis minimum and maximum (as int64 arrays)."""
+        return (np.array([c.min() for c in self.columns], dtype=np.int64),
+                np.array([c.max() for c in self.columns], dtype=np.int64))
+
+
+# ---------------------------------------------------------------------------
+# Level-of-detail helpers
+# ---------------------------------------------------------------------------
 
-    # Assume NIfTI
-    data = nib.load(filepath).get_fdata()
-    coords = np.argwhere(data != 0).astype(int)
-    return coords
+# Voxel-grid cell sizes of the LOD pyramid, finest first.
+_LOD_FACTORS = (1, 2, 4, 8)
+
+# Default maximum number of points sent to the browser per layer.
+_DEFAULT_POINT_BUDGET = 200_000
+
+# Distance of Plotly's default 3D camera eye (1.25, 1.25, 1.25) from the
+# scene centre; a closer eye means the user has zoomed in.
+_DEFAULT_EYE_DISTANCE = math.sqrt(3 * 1.25 ** 2)
+
+
+def _voxel_downsample(points: _PointColumns, factor: int) -> _PointColumns:
+    """Keep one point per ``factor``-sized grid cell (the first one found)."""
+    if factor <= 1 or len(points) == 0:
+        return points
+    cells = [(c // factor).astype(np.int64) for c in points.columns]
+    cells = [c - c.min() for c in cells]
+    dims = tuple(int(c.max()) + 1 for c in cells)
+    keys = np.ravel_multi_index(cells, dims)
+    _, first = np.unique(keys, return_index=True)
+    return points.take(np.sort(first))
+
+
+def _build_lod(points: _PointColumns) -> list[_PointColumns]:
+    """Return the LOD pyramid of ``points``, one array per :data:`_LOD_FACTORS`."""
+    return [_voxel_downsample(points, f) for f in _LOD_FACTORS]
+
+
+def _camera_zoom(relayout: dict | None) -> float:
+    """Return the camera zoom relative to Plotly's default eye distance."""
+    camera = (relayout or {}).get("scene.camera") or {}
+    eye = camera.get("eye")
+    if not eye:
+        return 1.0
+    dist = math.sqrt(sum(float(eye.get(a, 0)) ** 2 for a in "xyz"))
+    return _DEFAULT_EYE_DISTANCE / max(dist, 1e-6)
+
+
+def _select_lod(lod: list[_PointColumns], budget: int, zoom: float) -> int:
+    """Pick the finest LOD level that fits the point budget.
+
+    Zooming in raises the budget quadratically because only part of the
+    layer remains on screen. Falls back to the coarsest level when nothing
+    fits.
+    """
+    effective = budget * max(zoom, 1.0) ** 2
+    for level, pts in enumerate(lod):
+        if len(pts) <= effective:
+            return level
+    return len(lod) - 1
 
 
 # ---------------------------------------------------------------------------
 # Layer dataclass-like dict helpers
 # ---------------------------------------------------------------------------
 
+# Layer life cycle: "loading" until its data is in memory, then "ready".
+# A hidden layer whose data was dropped to stay within the viewer's
+# memory budget is "evicted" until it is shown again.
+_LOADING = "loading"
+_READY = "ready"
+_EVICTED = "evicted"
+
+# Keys of a layer dict that hold heavy data
+_DATA_KEYS = ("points", "mesh", "lod")
+
+
 def _make_layer(
     name: str,
     kind: str,           # "volume" or "skeleton"
@@ -92,8 +236,10 @@ def _make_layer(
     colour: str,
     opacity: float,
     marker_size: int,
-    points: np.ndarray,  # (N, 3)
+    render_mode: str | None = None,  # volume layers only
+    mesh_step: int = DEFAULT_MESH_STEP,
 ) -> dict:
+    """Return a layer without data; :func:`_load_layer_data` fills it in."""
     return dict(
         id=uuid.uuid4().hex[:8],
         name=name,
@@ -102,21 +248,286 @@ def _make_layer(
         colour=colour,
         opacity=opacity,
         marker_size=marker_size,
-        points=points,
+        render_mode=render_mode,
+        mesh_step=mesh_step,
+        status=_LOADING,
+        progress=0.0,
+        points=None,  # _PointColumns
+        mesh=None,    # {"verts": (V, 3), "faces": (F, 3)} for mesh layers
+        lod=None,     # LOD pyramid of points (point layers only)
+        data_key=None,  # DataRegistry key of the data above, once loaded
+        # Metadata kept while the data is evicted
+        n_points=0,
+        bounds=None,  # per-axis (min, max) of the points
+        nbytes=0,     # size of the data
+        hidden_since=None,  # time.monotonic() when last hidden, None while shown
+        shown=False,  # whether the layer has ever been shown
+    )
+
+
+def _load_layer_data(
+    layer: dict,
+    progress: Optional[ProgressCallback] = None,
+) -> dict:
+    """Load the heavy data of a layer: its points, mesh and LOD pyramid."""
+    return _with_lod(_load_layer_arrays(layer, progress=progress))
+
+
+def _with_lod(data: dict) -> dict:
+    data["points"] = _PointColumns.from_array(data["points"])
+    # Mesh layers are drawn from their triangles, so they need no pyramid.
+    data["lod"] = None if data["mesh"] is not None else _build_lod(data["points"])
+    # The data may be shared by several layers through the registry
+    for arr in _iter_arrays(data):
+        arr.flags.writeable = False
+    return data
+
+
+def _iter_arrays(obj):
+    if isinstance(obj, np.ndarray):
+        yield obj
+    elif isinstance(obj, _PointColumns):
+        yield from obj.columns
+    elif isinstance(obj, dict):
+        for v in obj.values():
+            yield from _iter_arrays(v)
+    elif isinstance(obj, list):
+        for v in obj:
+            yield from _iter_arrays(v)
+
+
+def _data_key(layer: dict) -> tuple:
+    """Registry key of a layer's data: its file and how the file is read.
+
+    Layers that differ only in style (name, colour, opacity, marker size)
+    share one key, and thus one copy of the data. A skeleton's key also
+    covers its edit journal, so saved edits are not hidden by old data.
+    """
+    companions = ((skeleton_journal_path(layer["filepath"]),)
+                  if layer["kind"] == "skeleton" else ())
+    return file_key(layer["filepath"], layer["kind"], layer["render_mode"],
+                    layer["mesh_step"] if layer["render_mode"] == RENDER_MESH else None,
+                    companions=companions)
+
+
+def _load_layer_arrays(
+    layer: dict,
+    progress: Optional[ProgressCallback] = None,
+) -> dict:
+    """Load the (N, 3) compact points and (for mesh layers) the mesh of a layer."""
+    mesh = None
+    if layer["kind"] == "volume":
+        data = _load_nifti_volume(layer["filepath"], progress=progress)
+        pts = volume_points(data == 1, layer["render_mode"])
+        if layer["render_mode"] == RENDER_MESH:
+            verts, faces = volume_mesh(data == 1, step_size=layer["mesh_step"])
+            mesh = dict(verts=verts, faces=faces, step=layer["mesh_step"])
+    else:
+        pts = _load_skeleton(layer["filepath"], progress=progress)
+    return dict(points=compact_coords(pts), mesh=mesh)
+
+
+# ---------------------------------------------------------------------------
+# Process-pool batch loading
+# ---------------------------------------------------------------------------
+
+class _SharedArray(NamedTuple):
+    """Picklable handle of an array placed in a shared-memory block."""
+    shm_name: str
+    shape: tuple
+    dtype: str
+
+
+def _share(obj):
+    """Move every array in a nested dict/list into shared memory."""
+    if isinstance(obj, np.ndarray):
+        arr = np.ascontiguousarray(obj)
+        shm = SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[...] = arr
+        handle = _SharedArray(shm.name, arr.shape, arr.dtype.str)
+        shm.close()
+        # The parent process unlinks the block; stop this process's
+        # resource tracker from also "cleaning it up" when the worker exits.
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return handle
+    if isinstance(obj, dict):
+        return {k: _share(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_share(v) for v in obj]
+    return obj
+
+
+def _unshare(obj):
+    """Inverse of :func:`_share`: copy arrays out and free the blocks."""
+    if isinstance(obj, _SharedArray):
+        shm = SharedMemory(name=obj.shm_name)
+        try:
+            return np.ndarray(obj.shape, np.dtype(obj.dtype), buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+    if isinstance(obj, dict):
+        return {k: _unshare(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_unshare(v) for v in obj]
+    return obj
+
+
+def _decode_in_worker(layer: dict) -> dict:
+    """Worker-process entry point of :meth:`MultiViewer.add_many`.
+
+    Decodes the layer file and returns its arrays as shared-memory handles,
+    so only a few names travel back through the result pipe.
+    """
+    return _share(_load_layer_arrays(layer))
+
+
+# ---------------------------------------------------------------------------
+# Figure helpers
+# ---------------------------------------------------------------------------
+
+def _visible_flag(layer: dict, visible_ids: set) -> bool | str:
+    """Plotly ``visible`` value of a layer trace."""
+    return True if layer["id"] in visible_ids else "legendonly"
+
+
+def _layer_trace(layer: dict, visible: bool | str, lod_level: int | None = None) -> dict:
+    """Build the Plotly trace of one layer (a mesh3d or a scatter3d).
+
+    Traces are plain dicts so that coordinates can be sent as base64
+    typed arrays (see :func:`volume_utils.typed_array`).
+    """
+    mesh = layer.get("mesh")
+    if mesh is not None:
+        verts, faces = mesh["verts"], mesh["faces"]
+        index_type = np.min_scalar_type(max(len(verts) - 1, 0))
+        return dict(
+            type="mesh3d",
+            x=typed_array(verts[:, 0]),
+            y=typed_array(verts[:, 1]),
+            z=typed_array(verts[:, 2]),
+            i=typed_array(faces[:, 0].astype(index_type)),
+            j=typed_array(faces[:, 1].astype(index_type)),
+            k=typed_array(faces[:, 2].astype(index_type)),
+            color=layer["colour"],
+            opacity=layer["opacity"],
+            flatshading=True,
+            name=layer["name"],
+            showlegend=True,
+            visible=visible,
+        )
+    pts = layer["points"]
+    if pts is None:
+        # Evicted (hence hidden): an empty trace keeps the layer's place
+        pts = _PointColumns(*(np.empty(0, dtype=np.uint16) for _ in range(3)))
+    elif lod_level is not None:
+        pts = layer["lod"][lod_level]
+    return dict(
+        type="scatter3d",
+        x=typed_array(pts.x),
+        y=typed_array(pts.y),
+        z=typed_array(pts.z),
+        mode="markers",
+        marker=dict(
+            size=layer["marker_size"],
+            color=layer["colour"],
+            opacity=layer["opacity"],
+        ),
+        name=layer["name"],
+        visible=visible,
     )
 
 
+def _scene_settings(layers: list[dict], scale_mode, scale_x, scale_y, scale_z) -> dict:
+    """Build the ``layout.scene`` aspect settings for a scale mode."""
+    # Plotly aspectmode: "data" | "cube" | "auto" | "manual"
+    # "equal" is not a native Plotly mode; we emulate it by
+    # computing the data ranges and setting manual ratios so that
+    # one unit in each axis occupies the same screen length.
+    scene = dict()
+
+    if scale_mode == "manual":
+        sx = max(float(scale_x or 1), 0.01)
+        sy = max(float(scale_y or 1), 0.01)
+        sz = max(float(scale_z or 1), 0.01)
+        scene["aspectmode"] = "manual"
+        scene["aspectratio"] = dict(x=sx, y=sy, z=sz)
+    elif scale_mode == "cube":
+        scene["aspectmode"] = "cube"
+    elif scale_mode == "equal":
+        # Compute ranges from all visible points and set manual
+        # ratios proportional to those ranges so that one data
+        # unit is the same length on every axis.
+        bounds = [l["bounds"] for l in layers if l["bounds"] is not None]
+        if bounds:
+            lows, highs = zip(*bounds)
+            ranges = np.max(highs, axis=0) - np.min(lows, axis=0)
+            ranges = np.where(ranges == 0, 1, ranges)  # avoid zero
+            max_range = ranges.max()
+            scene["aspectmode"] = "manual"
+            scene["aspectratio"] = dict(
+                x=float(ranges[0] / max_range),
+                y=float(ranges[1] / max_range),
+                z=float(ranges[2] / max_range),
+            )
+        else:
+            scene["aspectmode"] = "data"
+    else:
+        # "data" – proportional to data ranges (default)
+        scene["aspectmode"] = "data"
+    return scene
+
+
 # ---------------------------------------------------------------------------
 # MultiViewer class
 # ---------------------------------------------------------------------------
 
 class MultiViewer:
-    """Dash-based 3D viewer that can hold many volumes and skeletons."""
+    """Dash-based 3D viewer that can hold many volumes and skeletons.
+
+    ``point_budget`` caps the number of points sent to the browser per
+    layer. Large layers are drawn from a voxel-grid downsampled level of
+    their LOD pyramid; zooming the camera in switches to finer levels.
+
+    Layers added with ``background=True`` (as the web UI does) are loaded
+    on a pool of ``max_workers`` threads, so several files load in
+    parallel while the UI stays responsive.
+
+    Layer data lives in a :class:`~data_registry.DataRegistry` (by default
+    the one shared by the whole process), so a file added several times,
+    here or in another viewer, is decoded and stored once as long as it is
+    read the same way. Removing the last layer that uses it frees it.
+
+    ``memory_budget`` (bytes) bounds the layer data the viewer keeps.
+    When it is exceeded, the data of the layers hidden for the longest
+    time is dropped, keeping only their settings; showing such a layer
+    again reloads it (from the registry or the volume cache when
+    possible). Layers that have not been shown yet are never evicted, so
+    loading more files than fit in the budget exceeds it until they have
+    been looked at.
+
+    With ``timings`` (or ``timings_panel``, which also adds an in-page
+    table) every callback is timed, see :mod:`callback_timing`.
+    """
 
-    def __init__(self):
+    def __init__(self, point_budget: int = _DEFAULT_POINT_BUDGET, max_workers: int = 4,
+                 timings: bool = False, timings_panel: bool = False,
+                 registry: DataRegistry | None = None,
+                 memory_budget: int | None = None):
         self._layers: list[dict] = []
+        self._point_budget = point_budget
         self._colour_idx = 0
         self._app: Optional[Dash] = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="layer-loader")
+        self._futures: dict[str, Future] = {}
+        self._registry = registry if registry is not None else default_registry()
+        self.memory_budget = memory_budget
+        self._visible_ids: set[str] = set()
+        self._reloading: set[str] = set()
+        self._memory_lock = RLock()
+        self.timings = CallbackTimings() if timings or timings_panel else None
+        self._timings_panel = timings_panel
 
     # -- public API for adding data before or after .run() ----------------
 
@@ -125,22 +536,26 @@ class MultiViewer:
         filepath: str,
         name: str | None = None,
         colour: str | None = None,
-        opacity: float = 0.05,
+        opacity: float | None = None,
         marker_size: int = 2,
+        render_mode: str = DEFAULT_RENDER_MODE,
+        mesh_step: int = DEFAULT_MESH_STEP,
+        background: bool = False,
     ) -> str:
         """Load a NIfTI segmentation and add it as a volume layer.
 
+        ``render_mode`` is ``"shell"`` (boundary voxels only, the default),
+        ``"full"`` (every foreground voxel) or ``"mesh"`` (a marching-cubes
+        surface decimated with a grid stride of ``mesh_step`` voxels).
+        ``opacity`` defaults to 0.05 for point clouds and 0.3 for meshes.
+        With ``background=True`` the layer is added right away in the
+        ``"loading"`` state and its data is loaded on the worker pool.
+
         Returns the layer id.
         """
-        data = _load_nifti_volume(filepath)
-        pts = np.column_stack(np.where(data == 1))
-        if name is None:
-            name = os.path.basename(filepath)
-        if colour is None:
-            colour = self._next_colour()
-        layer = _make_layer(name, "volume", filepath, colour, opacity, marker_size, pts)
-        self._layers.append(layer)
-        return layer["id"]
+        layer = self._new_layer("volume", filepath, name, colour, opacity, marker_size,
+                                render_mode=render_mode, mesh_step=mesh_step)
+        return self._add_layer(layer, background=background)
 
     def add_skeleton(
         self,
@@ -149,37 +564,130 @@ class MultiViewer:
         colour: str | None = None,
         opacity: float = 0.8,
         marker_size: int = 2,
+        background: bool = False,
     ) -> str:
-        """Load a skeleton (JSON or NIfTI) and add it as a skeleton layer.
+        """Load a skeleton (binary .npy, JSON or NIfTI) and add it as a skeleton layer.
+
+        See :meth:`add_volume` for ``background``.
 
         Returns the layer id.
         """
-        pts = _load_skeleton(filepath)
-        if name is None:
-            name = os.path.basename(filepath)
-        if colour is None:
-            colour = self._next_colour()
-        layer = _make_layer(name, "skeleton", filepath, colour, opacity, marker_size, pts)
-        self._layers.append(layer)
-        return layer["id"]
+        layer = self._new_layer("skeleton", filepath, name, colour, opacity, marker_size)
+        return self._add_layer(layer, background=background)
 
     def remove_layer(self, layer_id: str) -> bool:
-        """Remove a layer by its id. Returns True if found."""
-        before = len(self._layers)
-        self._layers = [l for l in self._layers if l["id"] != layer_id]
-        return len(self._layers) < before
+        """Remove a layer by its id. Returns True if found.
+
+        A layer that is still loading has its pending load cancelled. The
+        layer's reference to its data is released, which frees the data
+        if no other layer uses it.
+        """
+        layer = next((l for l in self._layers if l["id"] == layer_id), None)
+        future = self._futures.pop(layer_id, None)
+        if layer is None:
+            if future is not None:
+                future.cancel()
+            return False
+        with self._memory_lock:
+            self._layers = [l for l in self._layers if l["id"] != layer_id]
+        if future is None:
+            with self._memory_lock:
+                self._release_data(layer)
+        elif not future.cancel():
+            # Already loading (or loaded): release once the load is over
+            future.add_done_callback(lambda _: self._release_data(layer))
+        return True
 
     def list_layers(self) -> list[dict]:
         """Return a summary list of current layers (without heavy point data)."""
         return [
-            {k: v for k, v in l.items() if k != "points"}
+            {k: v for k, v in l.items() if k not in _DATA_KEYS and k != "data_key"}
             for l in self._layers
         ]
 
+    def add_many(
+        self,
+        items: Iterable[str | dict],
+        processes: int | None = None,
+    ) -> list[str | None]:
+        """Load many files in parallel worker processes and add them as layers.
+
+        Each item is a file path (added as a volume) or a dict with a
+        ``"filepath"``, an optional ``"kind"`` (``"volume"`` or
+        ``"skeleton"``) and any keyword accepted by :meth:`add_volume` or
+        :meth:`add_skeleton`. Files are decoded by a pool of ``processes``
+        workers (default: one per CPU) and their arrays are handed back
+        through shared memory.
+
+        Layers are added in input order. Returns the layer ids, with None
+        for files that failed to load (a warning is printed for those).
+        """
+        layers = []
+        for item in items:
+            spec = {"filepath": item} if isinstance(item, str) else dict(item)
+            kind = spec.pop("kind", "volume")
+            filepath = spec.pop("filepath")
+            layers.append(self._new_layer(kind, filepath, **spec))
+
+        # Files whose data is already in the registry are not decoded
+        # again, and each remaining file is decoded once however many
+        # layers use it.
+        failed = set()
+        by_key: dict[tuple, list[dict]] = {}
+        for layer in layers:
+            try:
+                key = _data_key(layer)
+            except OSError as exc:
+                print(f"Warning: could not load {layer['filepath']}: {exc}")
+                failed.add(layer["id"])
+                continue
+            if key in self._registry:
+                # The entry may be released before it is acquired; the
+                # layer is then decoded here instead of in the pool.
+                try:
+                    self._acquire_data(layer, key, lambda layer=layer: _load_layer_data(layer))
+                except Exception as exc:
+                    print(f"Warning: could not load {layer['filepath']}: {exc}")
+                    failed.add(layer["id"])
+            else:
+                by_key.setdefault(key, []).append(layer)
+
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {pool.submit(_decode_in_worker, group[0]): key
+                       for key, group in by_key.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    data = _with_lod(_unshare(future.result()))
+                except Exception as exc:
+                    print(f"Warning: could not load {by_key[key][0]['filepath']}: {exc}")
+                    failed.update(layer["id"] for layer in by_key[key])
+                    continue
+                for layer in by_key[key]:
+                    self._acquire_data(layer, key, lambda: data)
+
+        ids = []
+        with self._memory_lock:
+            for layer in layers:
+                if layer["id"] in failed:
+                    ids.append(None)
+                else:
+                    self._layers.append(layer)
+                    ids.append(layer["id"])
+        self._enforce_budget()
+        return ids
+
+    def wait_for_layers(self, timeout: float | None = None) -> bool:
+        """Block until background loads finish. Returns False on timeout."""
+        _, not_done = wait(list(self._futures.values()), timeout=timeout)
+        return not not_done
+
     # -- Dash app construction --------------------------------------------
 
     def _build_app(self) -> Dash:
         app = Dash(__name__, suppress_callback_exceptions=True)
+        if self.timings is not None:
+            self.timings.instrument(app)
 
         app.layout = html.Div(
             style={"fontFamily": "Arial, sans-serif"},
@@ -204,7 +712,7 @@ class MultiViewer:
                             dcc.Input(
                                 id="input-filepath",
                                 type="text",
-                                placeholder="/path/to/file.nii.gz or .json",
+                                placeholder="/path/to/file.nii.gz, .npy or .json",
                                 style={"width": "400px"},
                             ),
                         ]),
@@ -222,6 +730,33 @@ class MultiViewer:
                                 style={"width": "200px"},
                             ),
                         ]),
+                        # Volume render mode
+                        html.Div([
+                            html.Label("Volume render"),
+                            dcc.Dropdown(
+                                id="input-render-mode",
+                                options=[
+                                    {"label": "Shell (boundary voxels)",
+                                     "value": "shell"},
+                                    {"label": "Full (all voxels)", "value": "full"},
+                                    {"label": "Mesh (surface)", "value": "mesh"},
+                                ],
+                                value=DEFAULT_RENDER_MODE,
+                                clearable=False,
+                                style={"width": "200px"},
+                            ),
+                        ]),
+                        # Mesh decimation
+                        html.Div([
+                            html.Label("Mesh step"),
+                            dcc.Input(
+                                id="input-mesh-step",
+                                type="number",
+                                min=1, max=16, step=1,
+                                value=DEFAULT_MESH_STEP,
+                                style={"width": "60px"},
+                            ),
+                        ]),
                         # Custom display name
                         html.Div([
                             html.Label("Display name (optional)"),
@@ -373,8 +908,16 @@ class MultiViewer:
 
                 # Hidden store that keeps the canonical layer-id list in sync
                 dcc.Store(id="layer-store", data=[]),
+                # LOD level currently drawn for each layer id
+                dcc.Store(id="lod-store", data={}),
+                # Ids of the layers drawn in the figure, in trace order
+                dcc.Store(id="figure-layers", data=[]),
+                # Polls background layer loads; enabled while any is pending
+                dcc.Interval(id="load-poll", interval=500, disabled=True),
             ],
         )
+        if self._timings_panel:
+            app.layout.children.append(self.timings.panel(app))
 
         # ---- Callbacks ----
 
@@ -391,10 +934,13 @@ class MultiViewer:
         @app.callback(
             Output("layer-store", "data"),
             Output("status-msg", "children"),
+            Output("load-poll", "disabled", allow_duplicate=True),
             Input("btn-add", "n_clicks"),
             Input("btn-remove", "n_clicks"),
             State("input-filepath", "value"),
             State("input-type", "value"),
+            State("input-render-mode", "value"),
+            State("input-mesh-step", "value"),
             State("input-name", "value"),
             State("input-colour", "value"),
             State("input-opacity", "value"),
@@ -405,61 +951,84 @@ class MultiViewer:
         )
         def _manage_layers(
             add_clicks, remove_clicks,
-            filepath, kind, name, colour, opacity, marker_size,
+            filepath, kind, render_mode, mesh_step, name, colour, opacity, marker_size,
             selected_ids, store_data,
         ):
             """Add or remove layers depending on which button was pressed."""
             ctx = callback_context
             if not ctx.triggered:
-                return no_update, no_update
+                return no_update, no_update, no_update
 
             trigger = ctx.triggered[0]["prop_id"].split(".")[0]
 
             # ---- Add ----
             if trigger == "btn-add":
                 if not filepath or not filepath.strip():
-                    return no_update, "⚠️  Please enter a file path."
+                    return no_update, "⚠️  Please enter a file path.", no_update
                 filepath = filepath.strip()
                 if not os.path.isfile(filepath):
-                    return no_update, f"⚠️  File not found: {filepath}"
+                    return no_update, f"⚠️  File not found: {filepath}", no_update
                 try:
                     # Resolve defaults
                     if not name or not name.strip():
                         name = None
                     if not colour or not colour.strip():
                         colour = None
-                    if opacity is None:
-                        opacity = 0.05 if kind == "volume" else 0.8
+                    if opacity is None and kind != "volume":
+                        opacity = 0.8
                     if marker_size is None:
                         marker_size = 2
+                    if mesh_step is None:
+                        mesh_step = DEFAULT_MESH_STEP
 
                     if kind == "volume":
                         lid = self.add_volume(filepath, name=name,
                                               colour=colour, opacity=opacity,
-                                              marker_size=int(marker_size))
+                                              marker_size=int(marker_size),
+                                              render_mode=render_mode,
+                                              mesh_step=int(mesh_step),
+                                              background=True)
                     else:
                         lid = self.add_skeleton(filepath, name=name,
                                                 colour=colour, opacity=opacity,
-                                                marker_size=int(marker_size))
-                    new_store = [l["id"] for l in self._layers]
-                    return new_store, f"✅  Added layer '{self._layers[-1]['name']}'"
+                                                marker_size=int(marker_size),
+                                                background=True)
+                    # The load-poll interval reports progress and completion
+                    return (self._store_data(),
+                            f"⏳  Loading '{self._layers[-1]['name']}'…", False)
                 except Exception as exc:
-                    return no_update, f"❌  Error loading file: {exc}"
+                    return no_update, f"❌  Error loading file: {exc}", no_update
 
             # ---- Remove ----
             if trigger == "btn-remove":
                 if not selected_ids:
-                    return no_update, "⚠️  Select layers to remove first."
+                    return no_update, "⚠️  Select layers to remove first.", no_update
                 removed = []
                 for lid in list(selected_ids):
                     layer = next((l for l in self._layers if l["id"] == lid), None)
                     if layer:
                         removed.append(layer["name"])
                     self.remove_layer(lid)
-                new_store = [l["id"] for l in self._layers]
-                return new_store, f"🗑️  Removed: {', '.join(removed)}"
+                new_store = self._store_data()
+                return new_store, f"🗑️  Removed: {', '.join(removed)}", no_update
 
-            return no_update, no_update
+            return no_update, no_update, no_update
+
+        @app.callback(
+            Output("layer-store", "data", allow_duplicate=True),
+            Output("status-msg", "children", allow_duplicate=True),
+            Output("load-poll", "disabled"),
+            Input("load-poll", "n_intervals"),
+            prevent_initial_call=True,
+        )
+        def _poll_loading(n_intervals):
+            """Report background load progress and publish finished layers."""
+            messages = self._collect_finished()
+            pending = [l for l in self._layers if l["status"] == _LOADING]
+            parts = [f"⏳  Loading '{l['name']}' ({l['progress']:.0%})" for l in pending]
+            status = "   ".join(parts + messages) or no_update
+            store = self._store_data() if messages else no_update
+            return store, status, not pending
 
         @app.callback(
             Output("layer-checklist", "options"),
@@ -473,6 +1042,10 @@ class MultiViewer:
             for layer in self._layers:
                 tag = "🟦" if layer["kind"] == "volume" else "🔴"
                 label = f'{tag} {layer["name"]}  [{layer["kind"]}, {layer["colour"]}]'
+                if layer["status"] == _LOADING:
+                    label = f"⏳ {label}  (loading…)"
+                elif layer["status"] == _EVICTED:
+                    label = f"{label}  (unloaded)"
                 options.append({"label": label, "value": layer["id"]})
             # Preserve previous selection where ids still exist
             valid = {l["id"] for l in self._layers}
@@ -481,89 +1054,118 @@ class MultiViewer:
 
         @app.callback(
             Output("3d-plot", "figure"),
+            Output("lod-store", "data"),
+            Output("figure-layers", "data"),
+            Output("layer-store", "data", allow_duplicate=True),
             Input("layer-store", "data"),
             Input("layer-checklist", "value"),
             Input("input-scale-mode", "value"),
             Input("input-scale-x", "value"),
             Input("input-scale-y", "value"),
             Input("input-scale-z", "value"),
-            State("3d-plot", "relayoutData"),
+            Input("3d-plot", "relayoutData"),
+            State("lod-store", "data"),
+            State("figure-layers", "data"),
+            prevent_initial_call="initial_duplicate",
         )
         def _update_3d(store_data, visible_ids, scale_mode,
-                       scale_x, scale_y, scale_z, relayout):
-            """Rebuild the 3D figure from all layers, toggling visibility."""
-            traces = []
+                       scale_x, scale_y, scale_z, relayout, prev_lod, figure_ids):
+            """Update the 3D figure, patching only what the trigger changed.
+
+            Adding or removing layers rebuilds the figure. Visibility and
+            scale changes only send the ``visible`` flags or the ``scene``
+            settings, and camera moves only resend layers whose LOD level
+            changed. Layers evicted or reloaded on the way are published to
+            the ``layer-store`` so that their labels follow.
+            """
+            ctx = callback_context
+            trigger = ctx.triggered[0]["prop_id"].split(".")[0] if ctx.triggered else None
             visible_ids = set(visible_ids or [])
-
-            for layer in self._layers:
-                pts = layer["points"]
-                if pts is None or len(pts) == 0:
-                    continue
-                visible = layer["id"] in visible_ids
-                traces.append(
-                    go.Scatter3d(
-                        x=pts[:, 0],
-                        y=pts[:, 1],
-                        z=pts[:, 2],
-                        mode="markers",
-                        marker=dict(
-                            size=layer["marker_size"],
-                            color=layer["colour"],
-                            opacity=layer["opacity"],
-                        ),
-                        name=layer["name"],
-                        visible=True if visible else "legendonly",
-                    )
-                )
-
-            # Build scene dict based on scale mode
-            # Plotly aspectmode: "data" | "cube" | "auto" | "manual"
-            # "equal" is not a native Plotly mode; we emulate it by
-            # computing the data ranges and setting manual ratios so that
-            # one unit in each axis occupies the same screen length.
-            scene = dict()
-
-            if scale_mode == "manual":
-                sx = max(float(scale_x or 1), 0.01)
-                sy = max(float(scale_y or 1), 0.01)
-                sz = max(float(scale_z or 1), 0.01)
-                scene["aspectmode"] = "manual"
-                scene["aspectratio"] = dict(x=sx, y=sy, z=sz)
-            elif scale_mode == "cube":
-                scene["aspectmode"] = "cube"
-            elif scale_mode == "equal":
-                # Compute ranges from all visible points and set manual
-                # ratios proportional to those ranges so that one data
-                # unit is the same length on every axis.
-                all_pts = [l["points"] for l in self._layers
-                           if l["points"] is not None and len(l["points"]) > 0]
-                if all_pts:
-                    combined = np.concatenate(all_pts, axis=0)
-                    ranges = combined.max(axis=0) - combined.min(axis=0)
-                    ranges = np.where(ranges == 0, 1, ranges)  # avoid zero
-                    max_range = ranges.max()
-                    scene["aspectmode"] = "manual"
-                    scene["aspectratio"] = dict(
-                        x=float(ranges[0] / max_range),
-                        y=float(ranges[1] / max_range),
-                        z=float(ranges[2] / max_range),
-                    )
-                else:
-                    scene["aspectmode"] = "data"
-            else:
-                # "data" – proportional to data ranges (default)
-                scene["aspectmode"] = "data"
-
+            # Shown layers that were evicted are reloaded; hidden ones may be evicted
+            reloaded = set(self._set_visible(visible_ids))
+            layers = self._layer_snapshot()
+            drawn = self._drawn_layers(layers)
+            drawn_ids = [l["id"] for l in drawn]
+            drawn_by_id = {l["id"]: l for l in drawn}
+            store = [[l["id"], l["status"]] for l in layers]
+            store = store if store != store_data else no_update
+
+            # Pick the LOD level of every layer for the current zoom.
+            zoom = _camera_zoom(relayout)
+            lod_levels = {
+                l["id"]: _select_lod(l["lod"], self._point_budget, zoom)
+                for l in layers if l["lod"] is not None
+            }
+            camera = (relayout or {}).get("scene.camera")
+
+            if trigger == "layer-store" and drawn_ids == figure_ids and not reloaded:
+                # Only statuses changed (e.g. hidden layers were evicted): the
+                # figure already has the right traces
+                return no_update, no_update, no_update, store
+
+            # Patches address traces by their index in the figure the browser
+            # has, which may lag behind the layer list (e.g. a layer that
+            # finished loading since); such layers wait for the rebuild.
+            published = [(i, layer) for i, layer in
+                         enumerate(drawn_by_id.get(lid) for lid in figure_ids or [])
+                         if layer is not None]
+
+            if trigger == "layer-checklist":
+                patch = Patch()
+                for i, layer in published:
+                    if layer["id"] in reloaded:
+                        patch["data"][i] = _layer_trace(layer, True,
+                                                        lod_levels.get(layer["id"]))
+                        continue
+                    patch["data"][i]["visible"] = _visible_flag(layer, visible_ids)
+                if camera:
+                    patch["layout"]["scene"]["camera"] = camera
+                return patch, lod_levels if reloaded else no_update, no_update, store
+
+            if trigger in ("input-scale-mode", "input-scale-x",
+                           "input-scale-y", "input-scale-z"):
+                patch = Patch()
+                scene = _scene_settings(layers, scale_mode,
+                                        scale_x, scale_y, scale_z)
+                for key, value in scene.items():
+                    patch["layout"]["scene"][key] = value
+                if camera:
+                    patch["layout"]["scene"]["camera"] = camera
+                return patch, no_update, no_update, store
+
+            if trigger == "3d-plot":
+                # Camera moves only need the layers whose level changed.
+                prev_lod = prev_lod or {}
+                if lod_levels == prev_lod:
+                    return no_update, no_update, no_update, store
+                patch = Patch()
+                for i, layer in published:
+                    level = lod_levels.get(layer["id"])
+                    if level is None or level == prev_lod.get(layer["id"]):
+                        continue
+                    pts = layer["lod"][level]
+                    patch["data"][i]["x"] = typed_array(pts.x)
+                    patch["data"][i]["y"] = typed_array(pts.y)
+                    patch["data"][i]["z"] = typed_array(pts.z)
+                return patch, lod_levels, no_update, store
+
+            # Layers were added or removed: rebuild the whole figure.
+            traces = [
+                _layer_trace(layer, _visible_flag(layer, visible_ids),
+                             lod_levels.get(layer["id"]))
+                for layer in drawn
+            ]
             layout = go.Layout(
                 title="3D View",
                 height=850,
-                scene=scene,
+                scene=_scene_settings(layers, scale_mode,
+                                      scale_x, scale_y, scale_z),
             )
             # Preserve camera if the user has panned / zoomed
-            if relayout and "scene.camera" in relayout:
-                layout.scene.camera = relayout["scene.camera"]
+            if camera:
+                layout.scene.camera = camera
 
-            return go.Figure(data=traces, layout=layout)
+            return {"data": traces, "layout": layout}, lod_levels, drawn_ids, store
 
         self._app = app
         return app
@@ -585,6 +1187,205 @@ class MultiViewer:
 
     # -- Internal helpers --------------------------------------------------
 
+    def _new_layer(
+        self,
+        kind: str,
+        filepath: str,
+        name: str | None = None,
+        colour: str | None = None,
+        opacity: float | None = None,
+        marker_size: int = 2,
+        render_mode: str | None = DEFAULT_RENDER_MODE,
+        mesh_step: int = DEFAULT_MESH_STEP,
+    ) -> dict:
+        """Create a layer dict (without data), resolving default settings."""
+        if kind != "volume":
+            render_mode = None
+        if name is None:
+            name = os.path.basename(filepath)
+        if colour is None:
+            colour = self._next_colour()
+        if opacity is None:
+            if kind != "volume":
+                opacity = 0.8
+            elif render_mode == RENDER_MESH:
+                opacity = _DEFAULT_MESH_OPACITY
+            else:
+                opacity = 0.05
+        return _make_layer(name, kind, filepath, colour, opacity, marker_size,
+                           render_mode=render_mode, mesh_step=mesh_step)
+
+    def _add_layer(self, layer: dict, background: bool = False) -> str:
+        # The layer is listed before its data arrives, so that the memory
+        # budget counts it
+        with self._memory_lock:
+            self._layers.append(layer)
+        if background:
+            self._futures[layer["id"]] = self._executor.submit(self._load_into, layer)
+            return layer["id"]
+        try:
+            self._load_into(layer)
+        except BaseException:
+            # A failing file never leaves a layer behind
+            with self._memory_lock:
+                self._layers = [l for l in self._layers if l is not layer]
+            raise
+        return layer["id"]
+
+    def _load_into(self, layer: dict) -> None:
+        """Load a layer's data and mark it ready (runs on a worker thread)."""
+        def progress(fraction: float) -> None:
+            # Decoding is most of the work; keep the rest for post-processing
+            layer["progress"] = 0.9 * fraction
+
+        self._acquire_data(layer, _data_key(layer),
+                           lambda: _load_layer_data(layer, progress=progress))
+        self._enforce_budget()
+
+    def _acquire_data(self, layer: dict, key: tuple, compute) -> None:
+        """Point a layer at the registry's data for ``key`` and mark it ready.
+
+        The caller enforces the memory budget once the layer is listed.
+        """
+        data = self._registry.acquire(key, compute)
+        points = data["points"]
+        with self._memory_lock:
+            layer.update(data)
+            layer["data_key"] = key
+            layer["n_points"] = len(points)
+            layer["bounds"] = points.bounds() if len(points) else None
+            layer["nbytes"] = data_nbytes(data)
+            layer["progress"] = 1.0
+            layer["status"] = _READY
+            if layer["id"] not in self._visible_ids and layer["hidden_since"] is None:
+                layer["hidden_since"] = time.monotonic()
+
+    def _release_data(self, layer: dict) -> None:
+        """Drop a layer's reference to its data (on removal or eviction)."""
+        key, layer["data_key"] = layer["data_key"], None
+        if key is not None:
+            self._registry.release(key)
+        for k in _DATA_KEYS:
+            layer[k] = None
+
+    # -- memory budget -----------------------------------------------------
+
+    def resident_bytes(self) -> int:
+        """Bytes of layer data this viewer holds (shared data counted once)."""
+        with self._memory_lock:
+            sizes = {l["data_key"]: l["nbytes"] for l in self._layers
+                     if l["data_key"] is not None}
+        return sum(sizes.values())
+
+    def _set_visible(self, visible_ids: set) -> list[str]:
+        """Record which layers are shown and reload shown evicted layers.
+
+        Reloading (which may decode a file) runs outside the memory lock, so
+        other callbacks are not held up. Returns the ids of the reloaded
+        layers.
+        """
+        with self._memory_lock:
+            self._visible_ids = set(visible_ids)
+            now = time.monotonic()
+            to_reload = []
+            for layer in self._layers:
+                if layer["id"] not in visible_ids:
+                    if layer["hidden_since"] is None:
+                        layer["hidden_since"] = now
+                    continue
+                layer["hidden_since"] = None
+                layer["shown"] = True
+                if layer["status"] == _EVICTED and layer["id"] not in self._reloading:
+                    self._reloading.add(layer["id"])
+                    to_reload.append(layer)
+        reloaded = []
+        for layer in to_reload:
+            try:
+                self._acquire_data(layer, _data_key(layer),
+                                   lambda l=layer: _load_layer_data(l))
+            except Exception as exc:
+                print(f"Warning: could not reload {layer['filepath']}: {exc}")
+                continue
+            finally:
+                with self._memory_lock:
+                    self._reloading.discard(layer["id"])
+            with self._memory_lock:
+                if not any(l is layer for l in self._layers):
+                    self._release_data(layer)  # removed while reloading
+                    continue
+            reloaded.append(layer["id"])
+        self._enforce_budget()
+        return reloaded
+
+    def _enforce_budget(self) -> None:
+        """Evict hidden layers, longest hidden first, until the data fits the budget.
+
+        Layers sharing their data are evicted together, and only when all
+        of them are hidden, since evicting just some would free nothing.
+        Layers that were never shown are kept: they were just loaded to be
+        looked at, and evicting them would only mean loading them again.
+        """
+        if self.memory_budget is None:
+            return
+        with self._memory_lock:
+            groups: dict[tuple, list[dict]] = {}
+            for layer in self._layers:
+                if layer["data_key"] is not None:
+                    groups.setdefault(layer["data_key"], []).append(layer)
+            total = sum(group[0]["nbytes"] for group in groups.values())
+            hidden = [g for g in groups.values()
+                      if all(l["hidden_since"] is not None and l["shown"] for l in g)]
+            # The group's most recently hidden layer decides its age
+            hidden.sort(key=lambda g: max(l["hidden_since"] for l in g))
+            for group in hidden:
+                if total <= self.memory_budget:
+                    break
+                total -= group[0]["nbytes"]
+                for layer in group:
+                    self._release_data(layer)
+                    layer["status"] = _EVICTED
+
+    def _collect_finished(self) -> list[str]:
+        """Reap finished background loads; returns one message per load."""
+        messages = []
+        for lid, future in list(self._futures.items()):
+            if not future.done():
+                continue
+            del self._futures[lid]
+            layer = next((l for l in self._layers if l["id"] == lid), None)
+            if layer is None or future.cancelled():
+                continue
+            exc = future.exception()
+            if exc is not None:
+                with self._memory_lock:
+                    self._layers = [l for l in self._layers if l["id"] != lid]
+                messages.append(f"❌  Error loading '{layer['name']}': {exc}")
+            else:
+                messages.append(f"✅  Added layer '{layer['name']}'")
+        return messages
+
+    def _store_data(self) -> list:
+        """Value of the ``layer-store``; changes whenever a layer changes state."""
+        return [[l["id"], l["status"]] for l in self._layers]
+
+    def _layer_snapshot(self) -> list[dict]:
+        """Shallow copies of the layers, taken under the memory lock.
+
+        Callbacks read layer data from these, so that an eviction or reload
+        on another thread cannot change it halfway through a figure.
+        """
+        with self._memory_lock:
+            return [dict(l) for l in self._layers]
+
+    @staticmethod
+    def _drawn_layers(layers: list[dict]) -> list[dict]:
+        """Layers that have a trace in the figure, in the trace order of a rebuilt figure.
+
+        Evicted layers keep their (empty) trace so that indices stay put.
+        """
+        return [l for l in layers
+                if l["status"] in (_READY, _EVICTED) and l["n_points"] > 0]
+
     _PALETTE_LEN = len(_PALETTE)
 
     def _next_colour(self) -> str:
@@ -610,21 +1411,72 @@ def main():
         "--skeleton", "-s",
         action="append",
         default=[],
-        help="Skeleton file(s) (JSON or NIfTI) to display. Can be repeated.",
+        help="Skeleton file(s) (.npy, JSON or NIfTI) to display. Can be repeated.",
+    )
+    parser.add_argument(
+        "--volume-mode",
+        choices=RENDER_MODES,
+        default=DEFAULT_RENDER_MODE,
+        help="How volumes are drawn: 'shell' (boundary voxels, default), "
+             "'full' or 'mesh'.",
+    )
+    parser.add_argument(
+        "--mesh-step",
+        type=int,
+        default=DEFAULT_MESH_STEP,
+        help="Marching-cubes stride for --volume-mode mesh; larger is coarser.",
+    )
+    parser.add_argument(
+        "--point-budget",
+        type=int,
+        default=_DEFAULT_POINT_BUDGET,
+        help="Maximum number of points drawn per layer before zooming in.",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help="Worker processes used to decode the files (default: one per CPU).",
+    )
+    parser.add_argument(
+        "--memory-budget-mb",
+        type=float,
+        default=None,
+        help="Memory budget for layer data; the data of layers hidden the "
+             "longest is unloaded beyond it (default: no limit). Layers that "
+             "have not been shown yet are never unloaded, so the files loaded "
+             "at startup may exceed it.",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Time every callback; summaries are served at /_timings.",
+    )
+    parser.add_argument(
+        "--timings-panel",
+        action="store_true",
+        help="Like --timings, and show the summaries in the page.",
     )
     parser.add_argument("--port", type=int, default=8050)
     parser.add_argument("--no-browser", action="store_true")
     args = parser.parse_args()
 
-    viewer = MultiViewer()
-
-    for vol_path in args.volumes:
-        viewer.add_volume(vol_path)
-        print(f"Loaded volume: {vol_path}")
-
-    for sk_path in args.skeleton:
-        viewer.add_skeleton(sk_path)
-        print(f"Loaded skeleton: {sk_path}")
+    memory_budget = (int(args.memory_budget_mb * 2**20)
+                     if args.memory_budget_mb is not None else None)
+    viewer = MultiViewer(point_budget=args.point_budget, timings=args.timings,
+                         timings_panel=args.timings_panel, memory_budget=memory_budget)
+
+    # Decode all files in parallel worker processes
+    items = [
+        dict(filepath=p, kind="volume", render_mode=args.volume_mode,
+             mesh_step=args.mesh_step)
+        for p in args.volumes
+    ] + [dict(filepath=p, kind="skeleton") for p in args.skeleton]
+    if items:
+        ids = viewer.add_many(items, processes=args.processes)
+        for item, lid in zip(items, ids):
+            if lid is not None:
+                print(f"Loaded {item['kind']}: {item['filepath']}")
 
     viewer.run(port=args.port, open_browser=not args.no_browser)
 
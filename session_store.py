@@ -0,0 +1,528 @@
+"""
+session_store.py – Per-session skeleton state for the editing viewer.
+
+Every browser tab of the editor gets a session id, and the skeleton it
+edits lives in a session store instead of in process globals. Two stores
+are provided:
+
+* :class:`MemorySessionStore` keeps the sessions in this process. It is
+  the default and suits a single server process (threaded or not). It
+  can be bounded by a number of sessions and an idle time, past which
+  the least recently used sessions are dropped.
+* :class:`SQLiteSessionStore` keeps them in an SQLite database, so that
+  several server processes (e.g. gunicorn workers) can serve the same
+  sessions. A session is stored once in full and every edit after that
+  as the list of changes it made, so an edit writes a few records
+  however large the skeleton is. Each process caches the decoded
+  skeletons and, when another process has changed a session, replays
+  only the changes it has not seen.
+
+Both stores expose the same two context managers. ``edit(session_id)``
+applies a change atomically: it holds the session's lock for the whole
+block and, for SQLite, a write transaction that is committed when the
+block ends and rolled back if it raises. ``view(session_id)`` gives
+read-only access. The yielded :class:`SessionState` carries a ``dirty``
+flag, an :class:`EditLog` of the edits made since the last save (which
+is what gets appended to the skeleton's journal on save) and an
+:class:`EditHistory` for undo and redo.
+"""
+
+from __future__ import annotations
+
+import io
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+import numpy as np
+
+from volume_utils import JOURNAL_ADD, JOURNAL_RECORD, JOURNAL_REMOVE, compact_coords
+
+#: Builds the mutable skeleton object of a session from (N, 3) points. The
+#: object has a ``points`` array and an ``update(add=, remove=)`` method.
+SkeletonFactory = Callable[[np.ndarray], Any]
+
+
+class EditLog:
+    """Growable log of point edits held in compact arrays.
+
+    Entry ``i`` is ``ops[i]`` (``volume_utils.JOURNAL_ADD`` or
+    ``JOURNAL_REMOVE``) applied to voxel ``points[i]``. Memory grows with
+    the number of edits (13 bytes each), not with the skeleton size.
+
+    While ``changes`` is a list, every ``append``, ``extend`` and
+    ``clear`` is also recorded in it (see :class:`SQLiteSessionStore`).
+    """
+
+    def __init__(self, ops=None, points=None):
+        ops = np.empty(0, np.int8) if ops is None else np.asarray(ops, np.int8).reshape(-1)
+        n = len(ops)
+        self._ops = np.empty(max(2 * n, 64), dtype=np.int8)
+        self._points = np.empty((len(self._ops), 3), dtype=np.int32)
+        self._ops[:n] = ops
+        if n:
+            self._points[:n] = np.asarray(points).reshape(-1, 3)
+        self._n = n
+        self.changes: Optional[list] = None
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def ops(self) -> np.ndarray:
+        return self._ops[:self._n]
+
+    @property
+    def points(self) -> np.ndarray:
+        return self._points[:self._n]
+
+    def append(self, op: int, point) -> None:
+        self._reserve(self._n + 1)
+        self._ops[self._n] = op
+        self._points[self._n] = point
+        self._n += 1
+        if self.changes is not None:
+            self.changes.append(("extend", self._ops[self._n - 1:self._n].copy(),
+                                 self._points[self._n - 1:self._n].copy()))
+
+    def extend(self, ops, points) -> None:
+        ops = np.asarray(ops, dtype=np.int8).reshape(-1)
+        self._reserve(self._n + len(ops))
+        self._ops[self._n:self._n + len(ops)] = ops
+        self._points[self._n:self._n + len(ops)] = np.asarray(points).reshape(-1, 3)
+        self._n += len(ops)
+        if self.changes is not None and len(ops):
+            self.changes.append(("extend", ops.copy(),
+                                 self._points[self._n - len(ops):self._n].copy()))
+
+    def clear(self) -> None:
+        self._n = 0
+        if self.changes is not None:
+            self.changes.append(("clear", None, None))
+
+    def truncate(self, n: int) -> tuple[np.ndarray, np.ndarray]:
+        """Drop the entries from ``n`` on; returns copies of the dropped ops and points."""
+        ops, points = self._ops[n:self._n].copy(), self._points[n:self._n].copy()
+        self._n = min(n, self._n)
+        return ops, points
+
+    def to_bytes(self) -> bytes:
+        records = np.empty(self._n, dtype=JOURNAL_RECORD)
+        records["op"] = self.ops
+        records["x"], records["y"], records["z"] = self.points.T
+        return records.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "EditLog":
+        records = np.frombuffer(data, dtype=JOURNAL_RECORD)
+        return cls(records["op"], np.stack([records["x"], records["y"], records["z"]], axis=1))
+
+    def _reserve(self, n: int) -> None:
+        if n <= len(self._ops):
+            return
+        size = max(n, 2 * len(self._ops))
+        ops = np.empty(size, dtype=np.int8)
+        points = np.empty((size, 3), dtype=np.int32)
+        ops[:self._n] = self.ops
+        points[:self._n] = self.points
+        self._ops, self._points = ops, points
+
+
+class EditHistory:
+    """Undo/redo stacks of edit groups, stored as two :class:`EditLog` s.
+
+    A group is the list of point edits made by one user action (one click,
+    one region recompute). Each stack keeps its edits in a single log plus
+    the start offset of every group, so memory grows with the number of
+    edits only. Like :attr:`EditLog.changes`, ``changes`` records the
+    calls to ``record``, ``undo`` and ``redo`` while it is a list.
+    """
+
+    def __init__(self):
+        self._done, self._done_starts = EditLog(), []
+        self._undone, self._undone_starts = EditLog(), []
+        self.changes: Optional[list] = None
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._done_starts)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._undone_starts)
+
+    def record(self, ops, points) -> None:
+        """Push a new group of edits; this discards the redo stack."""
+        if len(ops) == 0:
+            return
+        if self.changes is not None:
+            self.changes.append(("record", np.array(ops, np.int8), np.array(points)))
+        self._done_starts.append(len(self._done))
+        self._done.extend(ops, points)
+        self._undone.clear()
+        self._undone_starts.clear()
+
+    def undo(self) -> Optional[tuple[np.ndarray, np.ndarray]]:
+        """Pop the last group; returns the edits that revert it (or None)."""
+        if not self._done_starts:
+            return None
+        if self.changes is not None:
+            self.changes.append(("undo", None, None))
+        ops, points = self._done.truncate(self._done_starts.pop())
+        self._undone_starts.append(len(self._undone))
+        self._undone.extend(ops, points)
+        # Revert in reverse order: additions become removals and vice versa
+        return -ops[::-1], points[::-1]
+
+    def redo(self) -> Optional[tuple[np.ndarray, np.ndarray]]:
+        """Re-apply the last undone group; returns its edits (or None)."""
+        if not self._undone_starts:
+            return None
+        if self.changes is not None:
+            self.changes.append(("redo", None, None))
+        ops, points = self._undone.truncate(self._undone_starts.pop())
+        self._done_starts.append(len(self._done))
+        self._done.extend(ops, points)
+        return ops, points
+
+    def to_bytes(self) -> bytes:
+        buf = io.BytesIO()
+        np.savez(buf, done=np.frombuffer(self._done.to_bytes(), np.uint8),
+                 done_starts=np.array(self._done_starts, np.int64),
+                 undone=np.frombuffer(self._undone.to_bytes(), np.uint8),
+                 undone_starts=np.array(self._undone_starts, np.int64))
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "EditHistory":
+        history = cls()
+        if data:
+            arrays = np.load(io.BytesIO(data))
+            history._done = EditLog.from_bytes(arrays["done"].tobytes())
+            history._done_starts = arrays["done_starts"].tolist()
+            history._undone = EditLog.from_bytes(arrays["undone"].tobytes())
+            history._undone_starts = arrays["undone_starts"].tolist()
+        return history
+
+
+class SessionState:
+    """Skeleton of one editing session, plus its unsaved changes and history."""
+
+    def __init__(self, skeleton, dirty: bool = False, version: int = 0,
+                 pending: EditLog | None = None, history: EditHistory | None = None):
+        self.skeleton = skeleton
+        self.dirty = dirty
+        # Edits since the last save
+        self.pending = pending if pending is not None else EditLog()
+        self.history = history if history is not None else EditHistory()
+        # Number of committed edits; used by stores to detect stale caches
+        self.version = version
+
+    def replay(self, kind: str, ops: Optional[np.ndarray], points: Optional[np.ndarray]) -> None:
+        """Apply one change recorded in ``pending.changes`` / ``history.changes``."""
+        if kind == "extend":
+            points = points.astype(np.int64)
+            self.skeleton.update(add=points[ops == JOURNAL_ADD],
+                                 remove=points[ops == JOURNAL_REMOVE])
+            self.pending.extend(ops, points)
+        elif kind == "clear":
+            self.pending.clear()
+        elif kind == "record":
+            self.history.record(ops, points)
+        elif kind == "undo":
+            self.history.undo()
+        elif kind == "redo":
+            self.history.redo()
+        else:
+            raise ValueError(f"Unknown session change {kind!r}")
+
+
+class MemorySessionStore:
+    """Sessions held in this process, each guarded by its own lock.
+
+    ``make_skeleton`` turns points into the session's skeleton object and
+    ``initial_points`` returns the points a new session starts from.
+
+    With ``max_sessions`` only that many sessions are kept, and with
+    ``ttl`` sessions not used for that many seconds are dropped; both
+    evict the least recently used sessions first (and never one that is
+    being used) when a session is accessed. An evicted session loses its
+    unsaved changes and starts again from ``initial_points``.
+    """
+
+    def __init__(self, make_skeleton: SkeletonFactory,
+                 initial_points: Callable[[], np.ndarray],
+                 max_sessions: Optional[int] = None, ttl: Optional[float] = None):
+        self._make_skeleton = make_skeleton
+        self._initial_points = initial_points
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        # Least recently used first
+        self._sessions: OrderedDict[str, SessionState] = OrderedDict()
+        self._last_used: dict[str, float] = {}
+        # The lock of a session and the number of threads holding or
+        # waiting for it; a session is only evicted when that is zero
+        self._locks: dict[str, threading.RLock] = {}
+        self._lock_users: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def edit(self, session_id: str) -> Iterator[SessionState]:
+        """Exclusive access to a session for the duration of the block."""
+        with self._session_lock(session_id):
+            state = self._state(session_id)
+            yield state
+            state.version += 1
+
+    @contextmanager
+    def view(self, session_id: str) -> Iterator[SessionState]:
+        """Read-only access to a session (no edit can interleave)."""
+        with self._session_lock(session_id):
+            yield self._state(session_id)
+
+    def session_ids(self) -> list[str]:
+        with self._lock:
+            return list(self._sessions)
+
+    def drop(self, session_id: str) -> None:
+        """Forget a session and its unsaved changes."""
+        with self._lock:
+            self._forget(session_id)
+
+    @contextmanager
+    def _session_lock(self, session_id: str) -> Iterator[None]:
+        """Hold the session's lock, counting this thread as one of its users."""
+        with self._lock:
+            lock = self._locks.setdefault(session_id, threading.RLock())
+            self._lock_users[session_id] = self._lock_users.get(session_id, 0) + 1
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                users = self._lock_users.pop(session_id) - 1
+                if users:
+                    self._lock_users[session_id] = users
+                elif session_id not in self._sessions:
+                    # Evicted or dropped while in use; nobody else has the lock
+                    self._locks.pop(session_id, None)
+
+    def _state(self, session_id: str) -> SessionState:
+        state = self._cached(session_id)
+        if state is None:
+            state = SessionState(self._make_skeleton(self._initial_points()))
+            self._cache(session_id, state)
+        return state
+
+    def _cached(self, session_id: str) -> Optional[SessionState]:
+        """The session's state if it is held, marking it as just used."""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is not None:
+                self._sessions.move_to_end(session_id)
+                self._last_used[session_id] = time.monotonic()
+            return state
+
+    def _cache(self, session_id: str, state: SessionState) -> None:
+        with self._lock:
+            self._sessions[session_id] = state
+            self._sessions.move_to_end(session_id)
+            self._last_used[session_id] = now = time.monotonic()
+            for other in list(self._sessions):
+                over = self.max_sessions is not None and len(self._sessions) > self.max_sessions
+                expired = self.ttl is not None and now - self._last_used[other] > self.ttl
+                if not (over or expired):
+                    break  # the rest were used more recently
+                if other == session_id:
+                    continue
+                if self._lock_users.get(other):
+                    continue  # in use by another thread
+                self._forget(other)
+
+    def _forget(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+        self._last_used.pop(session_id, None)
+        # A lock still in use is removed by its last user, so that every
+        # thread of a session keeps sharing the same lock
+        if not self._lock_users.get(session_id):
+            self._locks.pop(session_id, None)
+
+
+class SQLiteSessionStore(MemorySessionStore):
+    """Sessions persisted in an SQLite database shared between processes.
+
+    Edits run inside ``BEGIN IMMEDIATE`` transactions, so edits from
+    different processes are serialised by SQLite and each one either
+    commits completely or not at all.
+
+    The ``sessions`` table holds a *base* of every session: its skeleton
+    as a compact coordinate array (see :func:`volume_utils.compact_coords`),
+    unsaved edits and history at version ``base_version``. Each edit after
+    that only adds the changes it made (point edits, clears of the unsaved
+    edits, history steps) to the append-only ``session_ops`` table. A
+    process whose cached state is older replays the ops it has not seen;
+    once ``compact_after`` edits have piled up, the next edit writes a new
+    base and deletes them. ``max_sessions`` and ``ttl`` bound the cached
+    states only; evicted sessions are reloaded from the database.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id   TEXT PRIMARY KEY,
+            version      INTEGER NOT NULL,
+            dirty        INTEGER NOT NULL,
+            dtype        TEXT NOT NULL,
+            points       BLOB NOT NULL,
+            updated      REAL NOT NULL,
+            pending      BLOB NOT NULL DEFAULT x'',
+            history      BLOB NOT NULL DEFAULT x'',
+            base_version INTEGER NOT NULL DEFAULT 0
+        )
+    """
+
+    _OPS_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS session_ops (
+            session_id TEXT NOT NULL,
+            version    INTEGER NOT NULL,
+            seq        INTEGER NOT NULL,
+            kind       TEXT NOT NULL,
+            edits      BLOB NOT NULL,
+            PRIMARY KEY (session_id, version, seq)
+        )
+    """
+
+    def __init__(self, path: str, make_skeleton: SkeletonFactory,
+                 initial_points: Callable[[], np.ndarray], timeout: float = 30.0,
+                 compact_after: int = 256, max_sessions: Optional[int] = None,
+                 ttl: Optional[float] = None):
+        super().__init__(make_skeleton, initial_points, max_sessions, ttl)
+        self.path = path
+        self.compact_after = compact_after
+        self._timeout = timeout
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(self._SCHEMA)
+            conn.execute(self._OPS_SCHEMA)
+            columns = {r[1] for r in conn.execute("PRAGMA table_info(sessions)")}
+            for column in ("pending", "history"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE sessions ADD COLUMN {column} "
+                                 "BLOB NOT NULL DEFAULT x''")
+            if "base_version" not in columns:
+                # Older databases stored every session in full on each edit
+                conn.execute("ALTER TABLE sessions ADD COLUMN base_version "
+                             "INTEGER NOT NULL DEFAULT 0")
+                conn.execute("UPDATE sessions SET base_version = version")
+
+    @contextmanager
+    def edit(self, session_id: str) -> Iterator[SessionState]:
+        with self._session_lock(session_id):
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                state, base_version = self._refresh(conn, session_id)
+                changes = state.pending.changes = state.history.changes = []
+                try:
+                    yield state
+                finally:
+                    state.pending.changes = state.history.changes = None
+                state.version += 1
+                if base_version is None or state.version - base_version > self.compact_after:
+                    self._write_base(conn, session_id, state)
+                else:
+                    self._write_ops(conn, session_id, state, changes)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                # The cached state may hold half an edit; reload it next time
+                with self._lock:
+                    self._sessions.pop(session_id, None)
+                raise
+
+    @contextmanager
+    def view(self, session_id: str) -> Iterator[SessionState]:
+        with self._session_lock(session_id):
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                yield self._refresh(conn, session_id)[0]
+            finally:
+                conn.execute("COMMIT")
+
+    def session_ids(self) -> list[str]:
+        return [r[0] for r in self._connect().execute("SELECT session_id FROM sessions")]
+
+    def drop(self, session_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM session_ops WHERE session_id = ?", (session_id,))
+        super().drop(session_id)
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self._timeout, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _write_base(self, conn: sqlite3.Connection, session_id: str, state: SessionState) -> None:
+        """Store the whole session at its current version and drop its ops."""
+        points = compact_coords(state.skeleton.points)
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, version, dirty, dtype, points, "
+            "updated, pending, history, base_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (session_id, state.version, int(state.dirty), points.dtype.str,
+             points.tobytes(), time.time(), state.pending.to_bytes(),
+             state.history.to_bytes(), state.version))
+        conn.execute("DELETE FROM session_ops WHERE session_id = ?", (session_id,))
+
+    def _write_ops(self, conn: sqlite3.Connection, session_id: str, state: SessionState,
+                   changes: list) -> None:
+        """Append the changes of one edit to the session's ops."""
+        conn.executemany(
+            "INSERT INTO session_ops VALUES (?, ?, ?, ?, ?)",
+            [(session_id, state.version, seq, kind,
+              EditLog(ops, points).to_bytes() if ops is not None else b"")
+             for seq, (kind, ops, points) in enumerate(changes)])
+        conn.execute("UPDATE sessions SET version = ?, dirty = ?, updated = ? "
+                     "WHERE session_id = ?",
+                     (state.version, int(state.dirty), time.time(), session_id))
+
+    def _refresh(self, conn: sqlite3.Connection,
+                 session_id: str) -> tuple[SessionState, Optional[int]]:
+        """Return the cached state of a session, brought up to date with the database.
+
+        Also returns the version of the session's base (None if it has none yet).
+        """
+        row = conn.execute(
+            "SELECT version, base_version, dirty FROM sessions WHERE session_id = ?",
+            (session_id,)).fetchone()
+        state = self._cached(session_id)
+        if row is None:
+            if state is None or state.version != 0:
+                state = SessionState(self._make_skeleton(self._initial_points()))
+            self._cache(session_id, state)
+            return state, None
+        version, base_version, dirty = row
+        if state is None or not base_version <= state.version <= version:
+            dtype, points, pending, history = conn.execute(
+                "SELECT dtype, points, pending, history FROM sessions WHERE session_id = ?",
+                (session_id,)).fetchone()
+            points = np.frombuffer(points, dtype=np.dtype(dtype)).reshape(-1, 3)
+            state = SessionState(self._make_skeleton(points), False, base_version,
+                                 EditLog.from_bytes(pending), EditHistory.from_bytes(history))
+        if state.version < version:
+            for kind, edits in conn.execute(
+                    "SELECT kind, edits FROM session_ops WHERE session_id = ? AND version > ? "
+                    "ORDER BY version, seq", (session_id, state.version)):
+                log = EditLog.from_bytes(edits)
+                state.replay(kind, log.ops, log.points)
+            state.version = version
+        state.dirty = bool(dirty)
+        self._cache(session_id, state)
+        return state, base_version
@@ -0,0 +1,234 @@
+"""
+slice_render.py – Rasterised 2D slice images for the editing viewer.
+
+Drawing every foreground pixel of a slice as a scatter marker makes the
+figure grow with the number of pixels. Instead, the label slice is sent
+as one small palette PNG (1 bit per pixel before compression) shown by a
+``go.Image`` trace, and encoded slices are kept in an LRU cache keyed by
+z so that scrubbing back and forth does not re-encode them. While the Z
+slider moves, a :class:`SlicePrefetcher` encodes the slices around it in
+a background thread, further ahead the faster the slider is scrubbed.
+
+The PNG encoder only needs NumPy and zlib.
+"""
+
+from __future__ import annotations
+
+import base64
+import struct
+import math
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+import numpy as np
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_COLOUR_TYPE_PALETTE = 3
+
+#: Colours of background and label pixels (RGB); the background is drawn
+#: transparent so that the plot background shows through.
+DEFAULT_SLICE_PALETTE = ((255, 255, 255), (0, 0, 255))
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return (struct.pack(">I", len(data)) + kind + data
+            + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+
+def encode_png(
+    indices: np.ndarray,
+    palette: Sequence[tuple[int, int, int]],
+    transparent: Optional[int] = None,
+    level: int = 6,
+) -> bytes:
+    """Encode a 2D array of palette indices as a PNG image.
+
+    Row 0 of ``indices`` is the first (top) image row. Two-colour palettes
+    are written with 1 bit per pixel, others with 8. ``transparent`` is
+    the index of a fully transparent palette entry, if any.
+    """
+    indices = np.asarray(indices, dtype=np.uint8)
+    height, width = indices.shape
+    if len(palette) <= 2:
+        bit_depth = 1
+        rows = np.packbits(indices.astype(bool), axis=1)
+    else:
+        bit_depth = 8
+        rows = indices
+    # Each scanline starts with filter type 0 (none)
+    raw = np.zeros((height, rows.shape[1] + 1), dtype=np.uint8)
+    raw[:, 1:] = rows
+
+    header = struct.pack(">IIBBBBB", width, height, bit_depth, _COLOUR_TYPE_PALETTE, 0, 0, 0)
+    chunks = [_chunk(b"IHDR", header),
+              _chunk(b"PLTE", bytes(c for rgb in palette for c in rgb))]
+    if transparent is not None:
+        alpha = bytes(0 if i == transparent else 255 for i in range(len(palette)))
+        chunks.append(_chunk(b"tRNS", alpha))
+    chunks.append(_chunk(b"IDAT", zlib.compress(raw.tobytes(), level)))
+    chunks.append(_chunk(b"IEND", b""))
+    return _PNG_SIGNATURE + b"".join(chunks)
+
+
+def png_data_uri(png: bytes) -> str:
+    return "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+
+class SliceImageCache:
+    """LRU cache of label slices encoded as PNG data URIs, keyed by z.
+
+    ``slice_pixels(z)`` returns the ``(xs, ys)`` foreground pixels of a
+    slice of ``shape`` (nx, ny). Images are ``ny`` rows by ``nx`` columns,
+    so pixel (x, y) is column x of row y. Palette index ``transparent``
+    (the background by default) is fully transparent.
+    """
+
+    def __init__(self, slice_pixels, shape, maxsize: int = 256,
+                 palette=DEFAULT_SLICE_PALETTE, transparent: Optional[int] = 0):
+        self._slice_pixels = slice_pixels
+        self.shape = tuple(int(n) for n in shape[:2])
+        self.maxsize = maxsize
+        self.palette = palette
+        self.transparent = transparent
+        self.hits = self.misses = self.prefetched = 0
+        self._images: OrderedDict[int, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._images)
+
+    def __contains__(self, z):
+        with self._lock:
+            return int(z) in self._images
+
+    def get(self, z: int) -> str:
+        """Return the data URI of slice ``z``, encoding it on a miss.
+
+        Lookups are counted in :meth:`stats` (prefetching is not).
+        """
+        z = int(z)
+        with self._lock:
+            uri = self._images.get(z)
+            if uri is not None:
+                self._images.move_to_end(z)
+                self.hits += 1
+                return uri
+            self.misses += 1
+        return self._encode(z)
+
+    def warm(self, z: int) -> bool:
+        """Encode slice ``z`` if it is not cached yet; returns True if it was encoded."""
+        z = int(z)
+        if z in self:
+            return False
+        self._encode(z)
+        with self._lock:
+            self.prefetched += 1
+        return True
+
+    def _encode(self, z: int) -> str:
+        uri = png_data_uri(encode_png(self.rasterise(z), self.palette, self.transparent))
+        with self._lock:
+            self._images[z] = uri
+            while len(self._images) > self.maxsize:
+                self._images.popitem(last=False)
+        return uri
+
+    def stats(self) -> dict:
+        """Hit / miss counters of :meth:`get` and the number of prefetched slices."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else None,
+                    "prefetched": self.prefetched, "cached": len(self._images),
+                    "maxsize": self.maxsize}
+
+    def rasterise(self, z: int) -> np.ndarray:
+        """(ny, nx) uint8 image of slice ``z``: 1 for label pixels, 0 elsewhere."""
+        xs, ys = self._slice_pixels(z)
+        image = np.zeros(self.shape[::-1], dtype=np.uint8)
+        image[ys, xs] = 1
+        return image
+
+
+class SlicePrefetcher:
+    """Encodes the slices around the slider position in a background thread.
+
+    Call :meth:`notify` with every new slider value. The scrub speed is
+    estimated from the time between calls and the prefetch radius ``k``
+    covers ``horizon`` seconds of scrubbing at that speed, clamped to
+    ``[min_radius, max_radius]``. Slices ahead of the motion are encoded
+    first (up to ``k`` of them), then up to ``min_radius`` behind it. A new
+    position replaces the pending work of the previous one.
+    """
+
+    def __init__(self, cache: SliceImageCache, nz: int, min_radius: int = 2,
+                 max_radius: int = 32, horizon: float = 0.5):
+        self.cache = cache
+        self.nz = int(nz)
+        self.min_radius = min_radius
+        # Never prefetch more slices than the cache can hold
+        self.max_radius = max(min(max_radius, cache.maxsize // 2), min_radius)
+        self.horizon = horizon
+        self.radius = min_radius
+        self._velocity = 0.0  # slices per second, smoothed
+        self._last = None  # (z, time) of the previous notify
+        self._pending: list[int] = []
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def notify(self, z: int) -> None:
+        """Record a new slider position and queue the slices around it."""
+        z, now = int(z), time.monotonic()
+        with self._cond:
+            if self._last is not None:
+                last_z, last_t = self._last
+                dt = now - last_t
+                if dt > 1.0:
+                    self._velocity = 0.0  # a pause, not a scrub
+                elif dt > 0:
+                    self._velocity = 0.5 * self._velocity + 0.5 * (z - last_z) / dt
+            self._last = (z, now)
+            self.radius = min(max(math.ceil(abs(self._velocity) * self.horizon),
+                                  self.min_radius), self.max_radius)
+            self._pending = self._order(z)
+            self._ensure_thread()
+            self._cond.notify()
+
+    def _order(self, z: int) -> list[int]:
+        step = -1 if self._velocity < 0 else 1
+        ahead = [z + step * i for i in range(1, self.radius + 1)]
+        behind = [z - step * i for i in range(1, self.min_radius + 1)]
+        # Interleave the first few behind with the ones ahead, nearest first
+        order = [zz for pair in zip(ahead, behind) for zz in pair]
+        order += ahead[len(behind):] + behind[len(ahead):]
+        order = [zz for zz in order if 0 <= zz < self.nz]
+        # Popped from the end
+        return order[::-1]
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="slice-prefetch",
+                                            daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                z = self._pending.pop()
+            try:
+                self.cache.warm(z)
+            except Exception:
+                pass  # a failed prefetch is simply encoded again on demand
+
+    def stats(self) -> dict:
+        """The cache counters plus the current prefetch radius and queue length."""
+        with self._cond:
+            info = {"radius": self.radius, "velocity": self._velocity,
+                    "pending": len(self._pending)}
+        return {**self.cache.stats(), **info}
@@ -0,0 +1,42 @@
+import numpy as np
+
+from data_registry import DataRegistry, file_key
+from multi_viewer import MultiViewer
+from volume_utils import JOURNAL_ADD, append_skeleton_edits
+
+
+def test_file_key_follows_companion_files(tmp_path):
+    path, journal = tmp_path / "skeleton.npy", tmp_path / "skeleton.npy.journal"
+    np.save(path, np.zeros((1, 3), dtype=np.int64))
+    before = file_key(str(path), "skeleton", companions=(str(journal),))
+    assert before[-1] == (None,)
+    journal.write_bytes(b"x")
+    assert file_key(str(path), "skeleton", companions=(str(journal),)) != before
+    assert file_key(str(path), "skeleton") == before[:-1]
+
+
+def test_saved_edits_are_not_served_from_the_registry(tmp_path):
+    path = tmp_path / "skeleton.npy"
+    np.save(path, np.array([[1, 1, 1], [2, 2, 2]]))
+    registry = DataRegistry()
+    viewer = MultiViewer(registry=registry)
+    viewer.add_skeleton(str(path))
+
+    append_skeleton_edits(str(path), [JOURNAL_ADD], [[3, 3, 3]])
+    viewer.add_skeleton(str(path))
+    first, second = viewer._layers
+    assert first["data_key"] != second["data_key"]
+    assert len(first["points"]) == 2 and len(second["points"]) == 3
+
+
+def test_add_many_loads_data_released_after_the_lookup(tmp_path):
+    class StaleRegistry(DataRegistry):
+        # As if every entry were released right after the membership check
+        def __contains__(self, key):
+            return True
+
+    path = tmp_path / "skeleton.npy"
+    np.save(path, np.array([[1, 1, 1], [2, 2, 2]]))
+    viewer = MultiViewer(registry=StaleRegistry())
+    (layer_id,) = viewer.add_many([{"filepath": str(path), "kind": "skeleton"}], processes=1)
+    assert layer_id is not None and len(viewer._layers[0]["points"]) == 2
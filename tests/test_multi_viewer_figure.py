@@ -0,0 +1,62 @@
+import base64
+import json
+
+import numpy as np
+
+from data_registry import DataRegistry
+from multi_viewer import MultiViewer
+from volume_utils import typed_array
+
+
+def _update_3d(app, values, trigger):
+    """Call the viewer's _update_3d callback through the server, like the browser."""
+    key, spec = next((k, s) for k, s in app.callback_map.items()
+                     if getattr(s.get("callback"), "__wrapped__", None) is not None
+                     and s["callback"].__wrapped__.__name__ == "_update_3d")
+
+    def props(deps):
+        return [{**dep, "value": values.get(f"{dep['id']}.{dep['property']}")}
+                for dep in deps]
+
+    outputs = [dict(zip(("id", "property"), out.rsplit(".", 1)))
+               for out in key[2:-2].split("...")]
+    response = app.server.test_client().post("/_dash-update-component", json={
+        "output": key, "outputs": outputs, "inputs": props(spec["inputs"]),
+        "state": props(spec["state"]), "changedPropIds": [trigger]})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return json.loads(response.get_data())["response"]
+
+
+def test_patches_address_the_published_traces(tmp_path):
+    paths = []
+    for i in range(2):
+        path = tmp_path / f"skeleton{i}.npy"
+        np.save(path, np.full((4, 3), i))
+        paths.append(str(path))
+    viewer = MultiViewer(registry=DataRegistry())
+    first, second = (viewer.add_skeleton(p) for p in paths)
+    app = viewer._build_app()
+
+    # The browser's figure only has the second layer (the first arrived later)
+    values = {"layer-store.data": viewer._store_data(),
+              "layer-checklist.value": [second],
+              "lod-store.data": {}, "figure-layers.data": [second]}
+    figure = _update_3d(app, values, "layer-checklist.value")["3d-plot"]["figure"]
+    locations = [op["location"] for op in figure["operations"]]
+    assert locations == [["data", 0, "visible"]]
+
+    # A rebuild publishes the new trace order
+    out = _update_3d(app, values, "layer-store.data")
+    assert out["figure-layers"]["data"] == [first, second]
+    assert [t["visible"] for t in out["3d-plot"]["figure"]["data"]] == ["legendonly", True]
+
+
+def test_typed_arrays_use_dtype_names_the_browser_decodes():
+    for arr, dtype in ((np.arange(3, dtype=">u2"), "uint16"),
+                       (np.arange(3, dtype=np.int64), "int32"),
+                       (np.arange(3, dtype=np.float16), "float64")):
+        encoded = typed_array(arr)
+        assert encoded["dtype"] == dtype
+        decoded = np.frombuffer(base64.b64decode(encoded["bdata"]), dtype=dtype)
+        assert decoded.tolist() == [0, 1, 2]
+    assert typed_array([1, 2], np.uint32)["dtype"] == "uint32"
@@ -0,0 +1,27 @@
+import numpy as np
+
+from multi_viewer import _LOD_FACTORS, _PointColumns, _build_lod, _camera_zoom, _select_lod
+
+
+def _cube(n):
+    grid = np.stack(np.meshgrid(*(np.arange(n),) * 3, indexing="ij"), axis=-1)
+    return _PointColumns.from_array(grid.reshape(-1, 3))
+
+
+def test_pyramid_keeps_one_point_per_cell():
+    points = _cube(16)
+    lod = _build_lod(points)
+    assert [len(level) for level in lod] == [16 ** 3 // f ** 3 for f in _LOD_FACTORS]
+    assert lod[0] is points
+    for factor, level in zip(_LOD_FACTORS, lod):
+        cells = {tuple(p) for p in np.stack(level.columns, axis=1).tolist()}
+        assert len({tuple(c // factor for c in p) for p in cells}) == len(level)
+
+
+def test_zooming_in_selects_finer_levels():
+    lod = _build_lod(_cube(16))  # 4096, 512, 64 and 8 points
+    assert _select_lod(lod, 600, 1.0) == 1
+    zoomed = _camera_zoom({"scene.camera": {"eye": {"x": 0.4, "y": 0.4, "z": 0.4}}})
+    assert zoomed > 3 and _select_lod(lod, 600, zoomed) == 0
+    assert _select_lod(lod, 1, 1.0) == len(lod) - 1  # nothing fits: coarsest
+    assert _camera_zoom(None) == 1.0
@@ -0,0 +1,80 @@
+import threading
+
+import numpy as np
+
+import multi_viewer
+from data_registry import DataRegistry
+from multi_viewer import MultiViewer
+
+
+def _skeleton_files(tmp_path, count, n=2000):
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"skeleton{i}.npy"
+        np.save(path, rng.integers(0, 100, size=(n, 3)))
+        paths.append(str(path))
+    return paths
+
+
+def _layer_bytes(path):
+    viewer = MultiViewer(registry=DataRegistry())
+    viewer.add_skeleton(path)
+    return viewer.resident_bytes()
+
+
+def test_budget_counts_the_layer_being_added(tmp_path):
+    paths = _skeleton_files(tmp_path, 3)
+    one = _layer_bytes(paths[0])
+    viewer = MultiViewer(registry=DataRegistry(), memory_budget=int(2.5 * one))
+    ids = []
+    for p in paths:
+        ids.append(viewer.add_skeleton(p))
+        viewer._set_visible({ids[-1]})
+    assert viewer.resident_bytes() <= viewer.memory_budget
+    # The first layer, hidden the longest, made room for the third
+    statuses = {l["id"]: l["status"] for l in viewer.list_layers()}
+    assert statuses[ids[0]] == multi_viewer._EVICTED
+    assert statuses[ids[2]] == multi_viewer._READY
+
+
+def test_layers_are_not_evicted_before_being_shown(tmp_path):
+    paths = _skeleton_files(tmp_path, 3)
+    one = _layer_bytes(paths[0])
+    viewer = MultiViewer(registry=DataRegistry(), memory_budget=int(1.5 * one))
+    ids = viewer.add_many([{"filepath": p, "kind": "skeleton"} for p in paths], processes=1)
+    assert all(l["status"] == multi_viewer._READY for l in viewer.list_layers())
+
+    for layer_id in ids:
+        viewer._set_visible({layer_id})
+    assert viewer.resident_bytes() <= viewer.memory_budget
+    statuses = [l["status"] for l in viewer.list_layers()]
+    assert statuses == [multi_viewer._EVICTED, multi_viewer._EVICTED, multi_viewer._READY]
+
+
+def test_reload_decodes_outside_the_memory_lock(tmp_path, monkeypatch):
+    paths = _skeleton_files(tmp_path, 2)
+    one = _layer_bytes(paths[0])
+    viewer = MultiViewer(registry=DataRegistry(), memory_budget=int(1.5 * one))
+    first = viewer.add_skeleton(paths[0])
+    viewer._set_visible({first})
+    second = viewer.add_skeleton(paths[1])
+    viewer._set_visible({second})
+    assert viewer.list_layers()[0]["status"] == multi_viewer._EVICTED
+
+    load = multi_viewer._load_layer_data
+    lock_free = []
+
+    def checking_load(layer, progress=None):
+        # Another thread must be able to take the lock while we decode
+        taker = threading.Thread(target=lambda: lock_free.append(
+            viewer._memory_lock.acquire(timeout=1) and viewer._memory_lock.release() is None))
+        taker.start()
+        taker.join()
+        return load(layer, progress=progress)
+
+    monkeypatch.setattr(multi_viewer, "_load_layer_data", checking_load)
+    assert viewer._set_visible({first}) == [first]
+    assert lock_free == [True]
+    statuses = {l["id"]: l["status"] for l in viewer.list_layers()}
+    assert statuses == {first: multi_viewer._READY, second: multi_viewer._EVICTED}
@@ -0,0 +1,159 @@
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from minimall_dash_viewer import (SkeletonIndex, edit_session_points, recompute_session_region,
+                                  redo_session, toggle_session_point, undo_session)
+from session_store import MemorySessionStore, SQLiteSessionStore
+
+SHAPE = (16, 16, 8)
+BASE = np.array([[1, 1, 1], [2, 2, 2], [3, 3, 3]])
+
+
+def _make_store(path, **kwargs):
+    return SQLiteSessionStore(str(path), lambda p: SkeletonIndex(p, SHAPE), lambda: BASE, **kwargs)
+
+
+def _points(state):
+    return sorted(map(tuple, state.skeleton.points.tolist()))
+
+
+def _ops_rows(path):
+    with sqlite3.connect(str(path)) as conn:
+        return conn.execute("SELECT COUNT(*) FROM session_ops").fetchone()[0]
+
+
+def test_sqlite_edits_are_appended_and_replayed(tmp_path):
+    db = tmp_path / "sessions.sqlite"
+    writer, reader = _make_store(db), _make_store(db)
+    with writer.edit("s") as state:
+        toggle_session_point(state, (4, 4, 4))
+    with reader.view("s") as seen:
+        assert _points(seen) == [(1, 1, 1), (2, 2, 2), (3, 3, 3), (4, 4, 4)]
+
+    with writer.edit("s") as state:
+        toggle_session_point(state, (1, 1, 1))
+    with writer.edit("s") as state:
+        edit_session_points(state, [[5, 5, 5], [6, 6, 6]], "add")
+    with writer.edit("s") as state:
+        undo_session(state)
+    with writer.edit("s") as state:
+        undo_session(state)
+    with writer.edit("s") as state:
+        redo_session(state)
+    assert _ops_rows(db) > 0
+
+    with writer.view("s") as expected, reader.view("s") as seen:
+        assert _points(seen) == _points(expected) == [(2, 2, 2), (3, 3, 3), (4, 4, 4)]
+        assert seen.version == expected.version
+        assert seen.dirty
+        assert seen.pending.ops.tolist() == expected.pending.ops.tolist()
+        assert seen.pending.points.tolist() == expected.pending.points.tolist()
+        assert seen.history.can_redo and seen.history.can_undo
+
+    # A fresh process loads the base and replays every op
+    with _make_store(db).view("s") as fresh:
+        assert _points(fresh) == [(2, 2, 2), (3, 3, 3), (4, 4, 4)]
+        assert fresh.pending.points.tolist() == expected.pending.points.tolist()
+
+    with writer.edit("s") as state:
+        state.pending.clear()
+        state.dirty = False
+    with reader.view("s") as seen:
+        assert len(seen.pending) == 0 and not seen.dirty
+
+
+def test_sqlite_replaces_skeleton_and_compacts(tmp_path):
+    db = tmp_path / "sessions.sqlite"
+    writer, reader = _make_store(db, compact_after=3), _make_store(db)
+    labels = np.zeros(SHAPE, np.uint8)
+    labels[2:6, 2:6, 2:6] = 1
+    with writer.edit("s") as state:
+        recompute_session_region(state, labels, ((0, 8), (0, 8), (0, 8)))
+    with writer.view("s") as expected, reader.view("s") as seen:
+        assert _points(seen) == _points(expected)
+
+    for i in range(4):
+        with writer.edit("s") as state:
+            toggle_session_point(state, (10, 10, i))
+    assert _ops_rows(db) < 4
+    with writer.view("s") as expected, _make_store(db).view("s") as fresh:
+        assert _points(fresh) == _points(expected)
+        assert fresh.version == expected.version
+
+
+def test_sqlite_rolls_back_failed_edits(tmp_path):
+    db = tmp_path / "sessions.sqlite"
+    store = _make_store(db)
+    with store.edit("s") as state:
+        toggle_session_point(state, (4, 4, 4))
+    try:
+        with store.edit("s") as state:
+            toggle_session_point(state, (5, 5, 5))
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    with store.view("s") as state:
+        assert (5, 5, 5) not in map(tuple, state.skeleton.points.tolist())
+        assert state.version == 1
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemorySessionStore(lambda p: SkeletonIndex(p, SHAPE), lambda: BASE, max_sessions=2)
+    for session_id in ("a", "b"):
+        with store.edit(session_id) as state:
+            toggle_session_point(state, (9, 9, 1))
+    with store.view("a"):
+        pass
+    with store.view("c"):
+        pass
+    assert sorted(store.session_ids()) == ["a", "c"]
+    with store.view("b") as state:
+        assert not state.dirty  # started again from the base
+
+
+def test_memory_store_evicts_idle_sessions_but_not_busy_ones():
+    store = MemorySessionStore(lambda p: SkeletonIndex(p, SHAPE), lambda: BASE, ttl=0)
+    entered, leave = threading.Event(), threading.Event()
+
+    def hold_a():
+        with store.view("a"):
+            entered.set()
+            leave.wait()
+
+    holder = threading.Thread(target=hold_a)
+    holder.start()
+    entered.wait()
+    with store.view("b"):
+        pass
+    assert sorted(store.session_ids()) == ["a", "b"]  # "a" is in use
+    leave.set()
+    holder.join()
+    with store.view("c"):
+        pass
+    assert store.session_ids() == ["c"]
+
+
+def test_memory_store_eviction_keeps_edits_of_a_session_exclusive():
+    store = MemorySessionStore(lambda p: SkeletonIndex(p, SHAPE), lambda: BASE, max_sessions=1)
+    inside = {"a": 0, "b": 0, "c": 0}
+    overlaps = []
+
+    def edit(session_id):
+        for _ in range(50):
+            with store.edit(session_id):
+                inside[session_id] += 1
+                if inside[session_id] > 1:
+                    overlaps.append(session_id)
+                time.sleep(0.0005)
+                inside[session_id] -= 1
+
+    threads = [threading.Thread(target=edit, args=(s,)) for s in "aabbcc"]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not overlaps
+    assert not store._lock_users and set(store._locks) <= set(store.session_ids())
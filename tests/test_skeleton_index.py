@@ -0,0 +1,65 @@
+import numpy as np
+
+from minimall_dash_viewer import SkeletonIndex, SliceIndex, recompute_session_region
+from session_store import SessionState
+from skeleton_thinning import recompute_region
+
+
+def _slice_sets(slices, nz):
+    return [set(zip(slices.xs[slices.offsets[z]:slices.offsets[z + 1]].tolist(),
+                    slices.ys[slices.offsets[z]:slices.offsets[z + 1]].tolist()))
+            for z in range(nz)]
+
+
+def test_update_matches_rebuild():
+    rng = np.random.default_rng(0)
+    shape = (40, 30, 20)
+    points = rng.integers(0, 20, size=(500, 3))
+    index = SkeletonIndex(points, shape)
+    present = {tuple(p) for p in index.points.tolist()}
+
+    add = rng.integers(0, 20, size=(60, 3))
+    remove = np.concatenate([index.points[::7], rng.integers(0, 20, size=(10, 3))])
+    added, removed = index.update(add, remove)
+
+    dropped = {tuple(p) for p in remove.tolist()}
+    expected = (present - dropped) | ({tuple(p) for p in add.tolist()} - dropped)
+    assert {tuple(p) for p in index.points.tolist()} == expected
+    assert len(index) == len(expected)
+    assert {tuple(p) for p in removed.tolist()} == present & dropped
+    assert {tuple(p) for p in added.tolist()} == expected - present
+    assert all(tuple(p) in index for p in expected)
+
+    rebuilt = SliceIndex.from_points(index.points, shape)
+    assert _slice_sets(index.slices, shape[2]) == _slice_sets(rebuilt, shape[2])
+    assert len(index.slices.xs) == len(expected)
+
+
+def test_update_then_single_edits_stay_consistent():
+    shape = (10, 10, 5)
+    index = SkeletonIndex([[1, 1, 1], [2, 2, 2]], shape)
+    added, removed = index.update(add=[[3, 3, 3], [3, 3, 3]], remove=[[1, 1, 1]])
+    assert added.tolist() == [[3, 3, 3]]
+    assert removed.tolist() == [[1, 1, 1]]
+    assert index.toggle([2, 2, 2]) is False
+    assert index.toggle([4, 4, 4]) is True
+    assert sorted(index.points.tolist()) == [[3, 3, 3], [4, 4, 4]]
+    assert _slice_sets(index.slices, 5) == [set(), set(), set(), {(3, 3)}, {(4, 4)}]
+
+
+def test_recompute_region_updates_the_index_in_place():
+    shape = (12, 12, 6)
+    labels = np.zeros(shape, np.uint8)
+    labels[2:10, 5:7, 1:5] = 1
+    outside = [[11, 11, 0], [0, 0, 5]]
+    state = SessionState(SkeletonIndex(outside, shape))
+    index = state.skeleton
+    box = ((0, 11), (0, 11), (0, 5))
+    expected = {tuple(p) for p in recompute_region(labels, index.points.copy(), box).tolist()}
+
+    recompute_session_region(state, labels, box)
+    assert state.skeleton is index and state.dirty
+    assert {tuple(p) for p in index.points.tolist()} == expected
+    rebuilt = SliceIndex.from_points(index.points, shape)
+    assert _slice_sets(index.slices, shape[2]) == _slice_sets(rebuilt, shape[2])
+    assert len(state.pending) == len(expected ^ {tuple(p) for p in outside})
@@ -0,0 +1,73 @@
+"""Crash safety and compaction of the skeleton edit journal (volume_utils)."""
+
+import json
+
+import numpy as np
+
+from volume_utils import (JOURNAL_ADD, JOURNAL_RECORD, JOURNAL_REMOVE, append_skeleton_edits,
+                          compact_skeleton, read_skeleton, skeleton_journal_path,
+                          write_skeleton)
+
+BASE = np.array([[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+
+
+def _skeleton(tmp_path, name="skeleton.npy"):
+    path = str(tmp_path / name)
+    write_skeleton(BASE, path)
+    return path
+
+
+def _as_set(points):
+    return {tuple(p) for p in np.asarray(points).tolist()}
+
+
+def test_saved_edits_are_replayed(tmp_path):
+    path = _skeleton(tmp_path)
+    append_skeleton_edits(path, [JOURNAL_ADD, JOURNAL_REMOVE], [[2, 2, 2], [1, 2, 3]])
+    assert _as_set(read_skeleton(path)) == {(4, 5, 6), (7, 8, 9), (2, 2, 2)}
+
+
+def test_torn_tail_is_cut_before_the_next_save(tmp_path):
+    path = _skeleton(tmp_path)
+    append_skeleton_edits(path, [JOURNAL_ADD], [[2, 2, 2]])
+    with open(skeleton_journal_path(path), "ab") as f:
+        f.write(b"\x01\x05\x00\x00\x04\x00\x00")  # a record torn by a crash
+    append_skeleton_edits(path, [JOURNAL_ADD], [[4, 4, 4]])
+    assert _as_set(read_skeleton(path)) == _as_set(BASE) | {(2, 2, 2), (4, 4, 4)}
+
+
+def test_garbage_only_journal_does_not_lose_the_next_save(tmp_path):
+    path = _skeleton(tmp_path)
+    with open(skeleton_journal_path(path), "wb") as f:
+        f.write(b"\x01\x05\x00\x00\x04\x00\x00")
+    append_skeleton_edits(path, [JOURNAL_ADD], [[4, 4, 4]])
+    assert _as_set(read_skeleton(path)) == _as_set(BASE) | {(4, 4, 4)}
+
+
+def test_uncommitted_batch_is_not_committed_by_the_next_save(tmp_path):
+    path = _skeleton(tmp_path)
+    uncommitted = np.zeros(2, dtype=JOURNAL_RECORD)
+    uncommitted["op"] = JOURNAL_ADD
+    uncommitted["x"] = [10, 11]
+    with open(skeleton_journal_path(path), "ab") as f:
+        f.write(uncommitted.tobytes())  # a batch without its commit record
+    append_skeleton_edits(path, [JOURNAL_REMOVE], [[7, 8, 9]])
+    assert _as_set(read_skeleton(path)) == {(1, 2, 3), (4, 5, 6)}
+
+
+def test_compaction_folds_the_journal_into_the_base_file(tmp_path):
+    path = _skeleton(tmp_path)
+    append_skeleton_edits(path, [JOURNAL_ADD, JOURNAL_REMOVE], [[2, 2, 2], [4, 5, 6]],
+                          compact=False)
+    assert compact_skeleton(path) == 3
+    assert not (tmp_path / "skeleton.npy.journal").exists()
+    assert _as_set(read_skeleton(path, journal=False)) == {(1, 2, 3), (7, 8, 9), (2, 2, 2)}
+
+
+def test_json_compaction_replaces_the_file_atomically(tmp_path):
+    path = _skeleton(tmp_path, "skeleton.json")
+    append_skeleton_edits(path, [JOURNAL_ADD], [[2, 2, 2]], compact=False)
+    compact_skeleton(path)
+    with open(path) as f:
+        assert _as_set(json.load(f)) == _as_set(BASE) | {(2, 2, 2)}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["skeleton.json"]
@@ -0,0 +1,50 @@
+import base64
+
+import numpy as np
+
+from minimall_dash_viewer import (SkeletonIndex, edit_session_points, skeleton_trace_delta,
+                                  skeleton_trace_snapshot, toggle_session_point, undo_session)
+from session_store import MemorySessionStore
+
+SHAPE = (16, 16, 8)
+
+
+def _decode(points):
+    return np.stack([np.frombuffer(base64.b64decode(points[axis]['bdata']),
+                                   dtype=points[axis]['dtype']) for axis in 'xyz'], axis=1)
+
+
+def _rows(points):
+    return sorted(map(tuple, _decode(points).tolist()))
+
+
+def test_deltas_carry_only_the_changed_points():
+    store = MemorySessionStore(lambda p: SkeletonIndex(p, SHAPE),
+                               lambda: np.array([[1, 1, 1], [2, 2, 2]]))
+    with store.view("s") as state:
+        snapshot = skeleton_trace_snapshot(state, SHAPE)
+    assert snapshot['to'] == 0 and _rows(snapshot['points']) == [(1, 1, 1), (2, 2, 2)]
+
+    with store.edit("s") as state:
+        start = len(state.pending)
+        toggle_session_point(state, (1, 1, 1))
+        delta = skeleton_trace_delta(state, start, SHAPE)
+    assert (delta['from'], delta['to']) == (0, 1)
+    assert _rows(delta['add']) == [] and _rows(delta['remove']) == [(1, 1, 1)]
+
+    with store.edit("s") as state:
+        start = len(state.pending)
+        edit_session_points(state, [[3, 3, 3], [4, 4, 4], [2, 2, 2]], "add")
+        delta = skeleton_trace_delta(state, start, SHAPE)
+    assert (delta['from'], delta['to']) == (1, 2)
+    assert _rows(delta['add']) == [(3, 3, 3), (4, 4, 4)] and _rows(delta['remove']) == []
+
+    with store.edit("s") as state:
+        start = len(state.pending)
+        undo_session(state)
+        delta = skeleton_trace_delta(state, start, SHAPE)
+    assert _rows(delta['remove']) == [(3, 3, 3), (4, 4, 4)]
+
+    with store.view("s") as state:
+        assert state.version == delta['to']
+        assert _rows(skeleton_trace_snapshot(state, SHAPE)['points']) == [(2, 2, 2)]
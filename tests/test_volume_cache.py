@@ -0,0 +1,58 @@
+import nibabel as nib
+import numpy as np
+import pytest
+
+import volume_cache
+from multi_viewer import _load_nifti_volume
+from volume_cache import VolumeCache
+
+
+@pytest.fixture
+def segmentation(tmp_path):
+    data = np.zeros((4, 5, 6), dtype=np.int16)
+    data[1:3, 2:4, 1:5] = 1
+    path = tmp_path / "seg.nii.gz"
+    nib.save(nib.Nifti1Image(data, np.eye(4)), str(path))
+    return str(path), data == 1
+
+
+@pytest.fixture
+def default_cache():
+    yield
+    volume_cache.set_default_cache(None)
+    volume_cache._default_initialised = False
+
+
+def test_cold_load_keeps_fortran_order(tmp_path, segmentation, default_cache):
+    path, expected = segmentation
+    volume_cache.set_default_cache(VolumeCache(str(tmp_path / "cache")))
+
+    cold = _load_nifti_volume(path)
+    warm = _load_nifti_volume(path)
+    for mask in (cold, warm):
+        assert isinstance(mask, np.memmap) and mask.flags.f_contiguous
+        np.testing.assert_array_equal(mask, expected)
+
+
+def test_unusable_cache_dir_falls_back_to_compute(tmp_path, segmentation, default_cache):
+    path, expected = segmentation
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    cache = VolumeCache(str(blocker / "cache"))
+    volume_cache.set_default_cache(cache)
+
+    assert cache.get(path, "mask") is None
+    mask = _load_nifti_volume(path)
+    np.testing.assert_array_equal(mask, expected)
+    assert not isinstance(mask, np.memmap)
+
+
+def test_content_hash_is_memoised(tmp_path, segmentation):
+    path, _ = segmentation
+    cache = VolumeCache(str(tmp_path / "cache"))
+    digest = cache.content_hash(path)
+
+    memo = list((tmp_path / "cache" / "stat").iterdir())
+    assert len(memo) == 1 and memo[0].read_text() == digest
+    memo[0].write_text("memoised")
+    assert cache.content_hash(path) == "memoised"
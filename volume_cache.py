@@ -0,0 +1,224 @@
+"""
+volume_cache.py – Persistent on-disk cache of parsed volumes.
+
+Decompressing a ``.nii.gz`` segmentation and extracting its voxels is the
+slowest part of opening a case in either viewer. This module stores the
+results (binary masks, coordinate arrays) as ``.npy`` files that are
+memory-mapped on the next load.
+
+Layout of the cache directory::
+
+    <cache_dir>/
+        stat/<stat key>             content hash of a (path, mtime, size)
+        entries/<content hash>/     one directory per source file content
+            <name>.v<N>.npy         one array per cached product
+
+The stat files let unchanged files skip re-hashing; entries themselves are
+keyed by content so a renamed or touched file still hits. Entry
+directories have their mtime bumped on every access and the least
+recently used ones are evicted when the cache grows past ``max_bytes``.
+
+Configuration through environment variables:
+
+* ``SKELETON_VIEWER_CACHE_DIR`` – cache location (default
+  ``~/.cache/skeleton-viewer``); set it to an empty string to disable
+  caching.
+* ``SKELETON_VIEWER_CACHE_MB`` – size cap in MiB (default 2048).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from typing import Callable, Optional
+
+import numpy as np
+
+# Bump when the way cached arrays are derived changes.
+_CACHE_VERSION = 1
+
+_DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "skeleton-viewer")
+_DEFAULT_MAX_MB = 2048
+_HASH_CHUNK = 1 << 20
+
+
+class VolumeCache:
+    """Size-capped LRU cache of arrays derived from files on disk."""
+
+    def __init__(self, cache_dir: str, max_bytes: int = _DEFAULT_MAX_MB << 20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    # -- public API -------------------------------------------------------
+
+    def get(self, filepath: str, name: str) -> Optional[np.ndarray]:
+        """Return the cached ``name`` array of ``filepath`` or None.
+
+        The array is memory-mapped read-only. A cache directory that cannot
+        be read or written counts as a miss.
+        """
+        try:
+            entry = self._entry_dir(filepath)
+            path = os.path.join(entry, self._array_name(name))
+            arr = np.load(path, mmap_mode="r")
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        self._touch(entry)
+        return arr
+
+    def put(self, filepath: str, name: str, array: np.ndarray) -> np.ndarray:
+        """Store ``array`` as the ``name`` product of ``filepath``.
+
+        Returns the memory-mapped copy from the cache. Fortran-ordered
+        arrays are written as they are, without a contiguous copy.
+        """
+        entry = self._entry_dir(filepath)
+        os.makedirs(entry, exist_ok=True)
+        path = os.path.join(entry, self._array_name(name))
+        # Write to a temporary file first so readers never see partial data
+        fd, tmp = tempfile.mkstemp(dir=entry, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self._touch(entry)
+        self._evict()
+        return np.load(path, mmap_mode="r")
+
+    def get_or_compute(
+        self,
+        filepath: str,
+        name: str,
+        compute: Callable[[], np.ndarray],
+    ) -> np.ndarray:
+        """Return the cached array, computing and storing it on a miss."""
+        arr = self.get(filepath, name)
+        if arr is None:
+            arr = compute()
+            try:
+                arr = self.put(filepath, name, arr)
+            except OSError as exc:
+                print(f"Warning: could not cache {name} of {filepath}: {exc}")
+        return arr
+
+    def clear(self) -> None:
+        """Remove every cached entry."""
+        with self._lock:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    # -- keys -------------------------------------------------------------
+
+    def content_hash(self, filepath: str) -> str:
+        """Hash of the file content, memoised per (path, mtime, size)."""
+        st = os.stat(filepath)
+        stat_id = f"{os.path.abspath(filepath)}\0{st.st_mtime_ns}\0{st.st_size}"
+        stat_key = hashlib.sha1(stat_id.encode()).hexdigest()
+        stat_path = os.path.join(self.cache_dir, "stat", stat_key)
+        try:
+            with open(stat_path) as f:
+                digest = f.read().strip()
+            if digest:
+                return digest
+        except FileNotFoundError:
+            pass
+
+        h = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+                h.update(chunk)
+        digest = h.hexdigest()[:32]
+        # The memo only saves re-hashing; failing to write it is not an error
+        try:
+            stat_dir = os.path.dirname(stat_path)
+            os.makedirs(stat_dir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=stat_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(digest)
+                os.replace(tmp, stat_path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+        except OSError:
+            pass
+        return digest
+
+    def _entry_dir(self, filepath: str) -> str:
+        return os.path.join(self.cache_dir, "entries", self.content_hash(filepath))
+
+    @staticmethod
+    def _array_name(name: str) -> str:
+        return f"{name}.v{_CACHE_VERSION}.npy"
+
+    # -- LRU bookkeeping --------------------------------------------------
+
+    @staticmethod
+    def _touch(entry: str) -> None:
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache fits ``max_bytes``."""
+        root = os.path.join(self.cache_dir, "entries")
+        with self._lock:
+            entries = []
+            total = 0
+            for d in os.scandir(root):
+                if not d.is_dir():
+                    continue
+                size = sum(f.stat().st_size for f in os.scandir(d.path) if f.is_file())
+                entries.append((d.stat().st_mtime, size, d.path))
+                total += size
+            entries.sort()
+            # Never evict the most recently used entry, even if it alone
+            # exceeds the cap.
+            for _, size, path in entries[:-1]:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+
+# ---------------------------------------------------------------------------
+# Process-wide default cache
+# ---------------------------------------------------------------------------
+
+_default_cache: Optional[VolumeCache] = None
+_default_initialised = False
+
+
+def default_cache() -> Optional[VolumeCache]:
+    """Return the cache configured from the environment (None if disabled)."""
+    global _default_cache, _default_initialised
+    if not _default_initialised:
+        cache_dir = os.environ.get("SKELETON_VIEWER_CACHE_DIR", _DEFAULT_CACHE_DIR)
+        max_mb = int(os.environ.get("SKELETON_VIEWER_CACHE_MB", _DEFAULT_MAX_MB))
+        _default_cache = VolumeCache(cache_dir, max_mb << 20) if cache_dir else None
+        _default_initialised = True
+    return _default_cache
+
+
+def set_default_cache(cache: Optional[VolumeCache]) -> None:
+    """Replace the process-wide cache; pass None to disable caching."""
+    global _default_cache, _default_initialised
+    _default_cache = cache
+    _default_initialised = True
+
+
+def cached(filepath: str, name: str, compute: Callable[[], np.ndarray]) -> np.ndarray:
+    """Load ``name`` of ``filepath`` through the default cache, if enabled."""
+    cache = default_cache()
+    if cache is None:
+        return compute()
+    return cache.get_or_compute(filepath, name, compute)
@@ -0,0 +1,430 @@
+"""
+volume_utils.py – Helpers shared by the editing viewer and the multi viewer.
+
+Both Dash apps read NIfTI segmentations and turn them into point clouds or
+surface meshes for Plotly. The helpers in this module keep that loading
+and conversion in one place so the two viewers handle volumes the same
+way. NiBabel and scikit-image are imported on first use, which keeps this
+module cheap to import.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import os
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: journal writes are not locked across processes
+    fcntl = None
+
+import numpy as np
+
+# ---------------------------------------------------------------------------
+# NIfTI loading
+# ---------------------------------------------------------------------------
+
+#: Number of Z slices decoded at a time by the chunked loaders.
+DEFAULT_CHUNK_SLICES = 32
+
+#: Signature of progress callbacks: called with the fraction done (0..1).
+ProgressCallback = Callable[[float], None]
+
+
+def _iter_z_chunks(
+    filepath: str,
+    chunk_slices: int = DEFAULT_CHUNK_SLICES,
+    progress: Optional[ProgressCallback] = None,
+):
+    """Yield ``(z0, chunk)`` blocks of a NIfTI image along its third axis.
+
+    Blocks come straight from the image's data proxy, so they keep the
+    on-disk dtype (no float64 copy) unless the header asks for intensity
+    scaling. The file is kept open so a gzip stream is decoded only once.
+    ``progress`` is called after each block.
+    """
+    import nibabel as nib
+
+    img = nib.load(filepath, keep_file_open=True)
+    proxy = img.dataobj
+    if len(img.shape) < 3:
+        yield 0, np.asanyarray(proxy)
+        if progress is not None:
+            progress(1.0)
+        return
+    nz = img.shape[2]
+    for z0 in range(0, nz, chunk_slices):
+        yield z0, np.asanyarray(proxy[:, :, z0:z0 + chunk_slices])
+        if progress is not None:
+            progress(min(z0 + chunk_slices, nz) / nz)
+
+
+def read_label_mask(
+    filepath: str,
+    label: int = 1,
+    chunk_slices: int = DEFAULT_CHUNK_SLICES,
+    progress: Optional[ProgressCallback] = None,
+) -> np.ndarray:
+    """Read a NIfTI segmentation as a uint8 mask of the voxels equal to ``label``.
+
+    Peak memory is the uint8 output plus one native-dtype chunk of
+    ``chunk_slices`` slices. The mask is Fortran-ordered like the NIfTI
+    data on disk, so every Z chunk is written contiguously.
+    """
+    import nibabel as nib
+
+    shape = nib.load(filepath).shape
+    mask = np.zeros(shape, dtype=np.uint8, order="F")
+    for z0, chunk in _iter_z_chunks(filepath, chunk_slices, progress):
+        np.equal(chunk, label, out=mask[:, :, z0:z0 + chunk.shape[2]].view(bool))
+    return mask
+
+
+def read_nonzero_coords(
+    filepath: str,
+    chunk_slices: int = DEFAULT_CHUNK_SLICES,
+    progress: Optional[ProgressCallback] = None,
+) -> np.ndarray:
+    """Return the (N, 3) int coordinates of the non-zero voxels of a NIfTI file.
+
+    Coordinates are in the same (x-major) order as ``np.argwhere``.
+    """
+    parts = []
+    for z0, chunk in _iter_z_chunks(filepath, chunk_slices, progress):
+        coords = np.argwhere(chunk)
+        coords[:, 2] += z0
+        parts.append(coords)
+    coords = np.concatenate(parts) if parts else np.empty((0, 3), dtype=np.intp)
+    if len(parts) > 1:
+        coords = coords[np.lexsort(coords.T[::-1])]
+    return coords
+
+# ---------------------------------------------------------------------------
+# Skeleton files
+# ---------------------------------------------------------------------------
+
+#: Extension of the binary skeleton format: an (N, 3) ``.npy`` array in the
+#: smallest integer dtype that holds the coordinates, memory-mapped on load.
+SKELETON_BINARY_EXT = ".npy"
+
+
+def is_nifti_path(filepath: str) -> bool:
+    return filepath.endswith(".nii") or filepath.endswith(".nii.gz")
+
+
+def compact_coords(points) -> np.ndarray:
+    """Return (N, 3) coordinates in uint16 if they fit, int32 otherwise."""
+    points = np.asarray(points).reshape(-1, 3)
+    if len(points) and (points.min() < 0 or points.max() > np.iinfo(np.uint16).max):
+        return points.astype(np.int32)
+    return points.astype(np.uint16)
+
+
+def write_skeleton(points, filepath: str) -> None:
+    """Write skeleton points as binary ``.npy`` or, for other extensions, JSON.
+
+    The file then holds the whole skeleton, so its edit journal is removed.
+    """
+    dirpath = os.path.dirname(filepath) or "."
+    os.makedirs(dirpath, exist_ok=True)
+    # Write then rename so a crash never leaves a truncated skeleton
+    tmp = f"{filepath}.tmp"
+    if filepath.endswith(SKELETON_BINARY_EXT):
+        with open(tmp, "wb") as f:
+            np.save(f, compact_coords(points))
+    else:
+        with open(tmp, "w") as f:
+            json.dump(np.asarray(points).reshape(-1, 3).tolist(), f)
+    os.replace(tmp, filepath)
+    if os.path.exists(skeleton_journal_path(filepath)):
+        os.remove(skeleton_journal_path(filepath))
+
+
+def read_skeleton(
+    filepath: str,
+    progress: Optional[ProgressCallback] = None,
+    journal: bool = True,
+) -> np.ndarray:
+    """Read skeleton points from a binary ``.npy``, JSON or NIfTI file.
+
+    Binary skeletons are returned as a read-only memory map, unless edits
+    from the file's journal (see :func:`append_skeleton_edits`) have to be
+    applied; pass ``journal=False`` to read the base file only.
+    """
+    if filepath.endswith(SKELETON_BINARY_EXT):
+        points = np.load(filepath, mmap_mode="r").reshape(-1, 3)
+    elif is_nifti_path(filepath):
+        points = read_nonzero_coords(filepath, progress=progress)
+    else:
+        with open(filepath) as f:
+            points = np.array(json.load(f), dtype=int).reshape(-1, 3)
+    return apply_skeleton_journal(filepath, points) if journal else points
+
+
+# ---------------------------------------------------------------------------
+# Skeleton edit journal
+# ---------------------------------------------------------------------------
+
+#: Saved skeleton edits are appended to ``<skeleton file>`` + this suffix.
+SKELETON_JOURNAL_SUFFIX = ".journal"
+
+#: Journal operations. ``JOURNAL_COMMIT`` ends each appended batch; a batch
+#: without it (a save interrupted by a crash) is ignored on replay.
+JOURNAL_ADD = 1
+JOURNAL_REMOVE = -1
+JOURNAL_COMMIT = 0
+
+#: On-disk journal record: operation and voxel coordinates, 13 bytes.
+JOURNAL_RECORD = np.dtype([("op", "i1"), ("x", "<i4"), ("y", "<i4"), ("z", "<i4")])
+
+#: A journal is folded into its base file once it holds more records than
+#: this many, or than ``_COMPACT_RATIO`` times the number of skeleton points.
+_COMPACT_MIN_RECORDS = 4096
+_COMPACT_RATIO = 0.5
+
+
+def skeleton_journal_path(filepath: str) -> str:
+    return filepath + SKELETON_JOURNAL_SUFFIX
+
+
+def append_skeleton_edits(filepath: str, ops, points, compact: bool = True) -> None:
+    """Record skeleton edits in the journal of ``filepath``.
+
+    ``ops`` holds :data:`JOURNAL_ADD` / :data:`JOURNAL_REMOVE` per row of
+    the (N, 3) ``points``. The batch is written with a single append and
+    flushed to disk, so saving costs time proportional to the number of
+    edits. Anything after the last commit record (a torn record or an
+    uncommitted batch left by a crash) is cut off first, so it can
+    neither corrupt nor be committed by this batch. Operations are
+    absolute ("present" / "absent"), which makes replaying them
+    idempotent. With ``compact``, the journal is folded into the base
+    file once it grows past its threshold.
+    """
+    ops = np.asarray(ops, dtype=np.int8).reshape(-1)
+    points = np.asarray(points).reshape(-1, 3)
+    records = np.zeros(len(ops) + 1, dtype=JOURNAL_RECORD)
+    records["op"][:-1] = ops
+    records["x"][:-1], records["y"][:-1], records["z"][:-1] = points.T
+    records["op"][-1] = JOURNAL_COMMIT
+    with _open_journal(filepath) as f:
+        f.truncate(_committed_size(f))
+        f.write(records.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+        size = f.tell()
+    n_records = size // JOURNAL_RECORD.itemsize
+    if compact and n_records > _COMPACT_MIN_RECORDS and os.path.exists(filepath):
+        if n_records > _COMPACT_RATIO * len(read_skeleton(filepath, journal=False)):
+            compact_skeleton(filepath)
+
+
+def read_skeleton_journal(filepath: str) -> np.ndarray:
+    """Return the committed records of the journal of ``filepath``."""
+    path = skeleton_journal_path(filepath)
+    if not os.path.exists(path):
+        return np.empty(0, dtype=JOURNAL_RECORD)
+    with open(path, "rb") as f:
+        data = f.read()
+    # A torn final record or an uncommitted final batch is dropped
+    n = len(data) // JOURNAL_RECORD.itemsize
+    records = np.frombuffer(data, dtype=JOURNAL_RECORD, count=n)
+    commits = np.flatnonzero(records["op"] == JOURNAL_COMMIT)
+    if len(commits) == 0:
+        return records[:0]
+    records = records[:commits[-1]]
+    return records[records["op"] != JOURNAL_COMMIT]
+
+
+def apply_skeleton_journal(filepath: str, points: np.ndarray) -> np.ndarray:
+    """Apply the journal of ``filepath`` (if any) to its base ``points``.
+
+    Base points keep their order; added points follow in journal order.
+    """
+    records = read_skeleton_journal(filepath)
+    if len(records) == 0:
+        return points
+    coords = np.stack([records["x"], records["y"], records["z"]], axis=1).astype(np.int64)
+    keys = _coord_keys(coords)
+    # Only the last operation on each voxel matters
+    _, last = np.unique(keys[::-1], return_index=True)
+    last = np.sort(len(keys) - 1 - last)
+    keys, coords, ops = keys[last], coords[last], records["op"][last]
+    base = np.asarray(points).reshape(-1, 3)
+    keep = ~np.isin(_coord_keys(base), keys)
+    added = coords[ops == JOURNAL_ADD]
+    return np.concatenate([base[keep].astype(np.int64), added])
+
+
+def compact_skeleton(filepath: str) -> int:
+    """Fold the journal of ``filepath`` into the base file; returns the point count.
+
+    The base file is replaced atomically before the journal is removed. A
+    crash in between only leaves edits that are already in the base file,
+    and replaying them again changes nothing.
+    """
+    with _open_journal(filepath):
+        points = read_skeleton(filepath)
+        write_skeleton(points, filepath)
+    return len(points)
+
+
+def _coord_keys(coords: np.ndarray) -> np.ndarray:
+    # 21 bits per axis; coordinates are voxel indices
+    c = np.asarray(coords, dtype=np.int64)
+    return (c[:, 0] << 42) | (c[:, 1] << 21) | c[:, 2]
+
+
+def _committed_size(f) -> int:
+    """Size of the journal ``f`` up to and including its last commit record."""
+    size = os.fstat(f.fileno()).st_size
+    itemsize = JOURNAL_RECORD.itemsize
+    # Common case: the journal ends with a whole commit record
+    if size % itemsize == 0 and size:
+        f.seek(size - itemsize)
+        if f.read(itemsize) == bytes(itemsize):
+            return size
+    f.seek(0)
+    data = f.read()
+    records = np.frombuffer(data, dtype=JOURNAL_RECORD, count=len(data) // itemsize)
+    commits = np.flatnonzero(records["op"] == JOURNAL_COMMIT)
+    return int(commits[-1] + 1) * itemsize if len(commits) else 0
+
+
+def _open_journal(filepath: str):
+    """Open the journal of ``filepath`` for appending, locked against other processes."""
+    path = skeleton_journal_path(filepath)
+    while True:
+        f = open(path, "a+b")
+        if fcntl is None:
+            return f
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        # Compaction may have removed the file while we waited for the lock
+        if os.fstat(f.fileno()).st_nlink:
+            return f
+        f.close()
+
+
+def convert_skeleton(src: str, dst: str) -> int:
+    """Convert a skeleton between formats (by extension); returns the point count."""
+    points = read_skeleton(src)
+    write_skeleton(points, dst)
+    return len(points)
+
+
+# ---------------------------------------------------------------------------
+# Volume render modes
+# ---------------------------------------------------------------------------
+
+#: Only voxels with at least one background face-neighbour are drawn.
+RENDER_SHELL = "shell"
+#: Every foreground voxel is drawn.
+RENDER_FULL = "full"
+#: The segmentation surface is drawn as a triangle mesh.
+RENDER_MESH = "mesh"
+
+RENDER_MODES = (RENDER_SHELL, RENDER_FULL, RENDER_MESH)
+DEFAULT_RENDER_MODE = RENDER_SHELL
+
+#: Default marching-cubes stride (in voxels) used to decimate meshes.
+DEFAULT_MESH_STEP = 2
+
+
+def surface_mask(mask: np.ndarray) -> np.ndarray:
+    """Return the boundary voxels of a binary 3D mask.
+
+    A voxel is on the boundary when it is foreground and at least one of
+    its six face-neighbours is background (or lies outside the volume).
+    The test is done with shifted views of a zero-padded copy, so no
+    Python-level loop over voxels is involved.
+    """
+    mask = np.asarray(mask) != 0
+    if _is_fortran(mask):
+        # NIfTI masks are Fortran-ordered; the test is symmetric in the
+        # axes, so run it on the C-ordered transpose instead of copying.
+        return surface_mask(mask.T).T
+    p = np.pad(mask, 1, mode="constant", constant_values=False)
+    interior = mask.copy()
+    interior &= p[:-2, 1:-1, 1:-1]
+    interior &= p[2:, 1:-1, 1:-1]
+    interior &= p[1:-1, :-2, 1:-1]
+    interior &= p[1:-1, 2:, 1:-1]
+    interior &= p[1:-1, 1:-1, :-2]
+    interior &= p[1:-1, 1:-1, 2:]
+    return mask & ~interior
+
+
+def volume_points(mask: np.ndarray, mode: str = DEFAULT_RENDER_MODE) -> np.ndarray:
+    """Return the (N, 3) voxel coordinates to draw for a binary mask.
+
+    ``mode`` is one of :data:`RENDER_MODES`. ``"shell"`` keeps only the
+    boundary voxels, ``"full"`` keeps every foreground voxel. Mesh layers
+    are drawn from :func:`volume_mesh`; for them the shell points are
+    returned so that data extents can still be computed.
+    """
+    if mode in (RENDER_SHELL, RENDER_MESH):
+        mask = surface_mask(mask)
+    elif mode == RENDER_FULL:
+        mask = np.asarray(mask) != 0
+    else:
+        raise ValueError(f"Unknown render mode {mode!r}; expected one of {RENDER_MODES}")
+    if _is_fortran(mask):
+        # Scan in memory order; points then come out sorted by z
+        return np.ascontiguousarray(np.argwhere(mask.T)[:, ::-1])
+    return np.argwhere(mask)
+
+
+def _is_fortran(arr: np.ndarray) -> bool:
+    return arr.ndim > 1 and arr.flags.f_contiguous and not arr.flags.c_contiguous
+
+
+def volume_mesh(
+    mask: np.ndarray,
+    step_size: int = DEFAULT_MESH_STEP,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Extract the surface of a binary mask as a triangle mesh.
+
+    Runs marching cubes on a zero-padded copy of the mask so that objects
+    touching the volume border still yield closed surfaces. ``step_size``
+    is the marching-cubes grid stride: 1 gives the full-resolution
+    surface, larger values decimate it (roughly ``step_size**2`` fewer
+    triangles).
+
+    Returns ``(verts, faces)``: an (V, 3) float32 array of vertex
+    coordinates in voxel units and an (F, 3) int32 array of vertex indices.
+    """
+    from skimage.measure import marching_cubes
+
+    padded = np.pad(np.asarray(mask) != 0, 1, mode="constant").astype(np.uint8)
+    if not padded.any():
+        return np.empty((0, 3), dtype=np.float32), np.empty((0, 3), dtype=np.int32)
+    verts, faces, _, _ = marching_cubes(
+        padded, level=0.5, step_size=max(int(step_size), 1), allow_degenerate=False)
+    verts -= 1.0  # undo the padding offset
+    return verts.astype(np.float32), faces.astype(np.int32)
+
+
+# ---------------------------------------------------------------------------
+# Plotly typed arrays
+# ---------------------------------------------------------------------------
+
+#: Array types plotly.js decodes from base64 ("typed array" encoding).
+TYPED_ARRAY_DTYPES = ("int8", "uint8", "int16", "uint16", "int32", "uint32",
+                      "float32", "float64")
+
+
+def typed_array(arr, dtype=None) -> dict:
+    """Plotly base64 typed-array encoding ``{"dtype", "bdata"}`` of a 1D array.
+
+    The array is sent as its raw little-endian bytes instead of a JSON
+    list of numbers; plotly.js (and the editor's clientside callbacks)
+    decode it straight into a typed array. The array is converted to
+    ``dtype`` if one is given; types plotly.js cannot decode, such as
+    64-bit integers, are sent as int32 or float64.
+    """
+    arr = np.asarray(arr, dtype=dtype)
+    if arr.dtype.name not in TYPED_ARRAY_DTYPES:
+        arr = arr.astype(np.int32 if arr.dtype.kind in "iu" else np.float64)
+    arr = np.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder("<"))
+    return {"dtype": arr.dtype.name, "bdata": base64.b64encode(arr).decode("ascii")}